@@ -0,0 +1,259 @@
+"""Benchmark the headless calculator engine and check it against the old UI logic.
+
+Run from the calculator directory:
+    python bench_engine.py
+"""
+import math
+import random
+import time
+
+import numpy as np
+
+from engine import (
+    DIGITS, OPERATORS, SCI_OPERATORS, CalculatorEngine, calculate, calculate_array,
+    evaluate_chain, evaluate_sequences, sci_calculate, sci_calculate_array, to_display,
+)
+from expression import FUNCTIONS, IncrementalExpression, compile_expression, evaluate
+
+KEYS = DIGITS + OPERATORS + SCI_OPERATORS + ("=", "%", "+/-", "AC")
+
+
+class LegacyCalculator:
+    """The arithmetic of CalculatorApp.button_clicked before the engine split, minus Flet."""
+
+    class _Text:
+        value = "0"
+
+    def __init__(self):
+        self.result = self._Text()
+        self.reset()
+
+    def button_clicked(self, data):
+        if self.result.value == "Error" or data == "AC":
+            self.result.value = "0"
+            self.reset()
+        elif data in ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "."):
+            if self.result.value == "0" or self.new_operand:
+                self.result.value = data
+                self.new_operand = False
+            else:
+                self.result.value += data
+        elif data in ("+", "-", "*", "/"):
+            self.result.value = self.calculate(
+                self.operand1, float(self.result.value), self.operator
+            )
+            self.operator = data
+            if self.result.value == "Error":
+                self.operand1 = 0
+            else:
+                self.operand1 = float(self.result.value)
+            self.new_operand = True
+        elif data == "=":
+            self.result.value = self.calculate(
+                self.operand1, float(self.result.value), self.operator
+            )
+            self.reset()
+        elif data == "%":
+            self.result.value = float(self.result.value) / 100
+            self.reset()
+        elif data == "+/-":
+            if float(self.result.value) > 0:
+                self.result.value = "-" + str(self.result.value)
+            elif float(self.result.value) < 0:
+                self.result.value = str(self.format_number(abs(float(self.result.value))))
+        elif data in ("sin", "cos", "tan", "log", "√"):
+            self.result.value = self.sci_calculate(float(self.result.value), data)
+            self.reset()
+
+    def sci_calculate(self, value, operator):
+        if operator == "sin":
+            return self.format_number(math.sin(math.radians(value)))
+        elif operator == "cos":
+            return self.format_number(math.cos(math.radians(value)))
+        elif operator == "tan":
+            return self.format_number(math.tan(math.radians(value)))
+        elif operator == "log":
+            return self.format_number(math.log10(value))
+        elif operator == "√":
+            return self.format_number(math.sqrt(value))
+
+    def format_number(self, num):
+        if num % 1 == 0:
+            return int(num)
+        else:
+            return num
+
+    def calculate(self, operand1, operand2, operator):
+        if operator == "+":
+            return self.format_number(operand1 + operand2)
+        elif operator == "-":
+            return self.format_number(operand1 - operand2)
+        elif operator == "*":
+            return self.format_number(operand1 * operand2)
+        elif operator == "/":
+            if operand2 == 0:
+                return "Error"
+            else:
+                return self.format_number(operand1 / operand2)
+
+    def reset(self):
+        self.operator = "+"
+        self.operand1 = 0
+        self.new_operand = True
+
+
+def random_sequences(count, length, seed=0):
+    rng = random.Random(seed)
+    # Weight digits so that most sequences build real numbers
+    weights = [6 if key in DIGITS else 1 for key in KEYS]
+    return [rng.choices(KEYS, weights, k=length) for _ in range(count)]
+
+
+def check_sequences(sequences):
+    """Compare the engine with the legacy logic key by key.
+
+    The legacy handler raised on inputs such as "." or log(-1); the engine shows
+    "Error" instead, so comparison of a sequence stops at the first such key.
+    """
+    compared = diverged = 0
+    for keys in sequences:
+        legacy = LegacyCalculator()
+        engine = CalculatorEngine()
+        for key in keys:
+            try:
+                legacy.button_clicked(key)
+            except ValueError:
+                diverged += 1
+                break
+            assert engine.press(key) == str(legacy.result.value), (keys, key)
+            compared += 1
+    return compared, diverged
+
+
+def check_arrays(size=10_000, seed=0):
+    """Compare the vectorized functions with the scalar ones."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(-1000, 1000, size).astype(float) / rng.choice([1, 4, 10], size)
+    b = rng.integers(-1000, 1000, size).astype(float) / rng.choice([1, 4, 10], size)
+    b[::50] = 0
+    for operator in OPERATORS:
+        expected = [str(calculate(x, y, operator)) for x, y in zip(a, b)]
+        assert list(to_display(calculate_array(a, b, operator))) == expected, operator
+    # NumPy's tan/log10 may differ from math's in the last bit, so compare with a tolerance
+    for operator in SCI_OPERATORS:
+        expected = np.array([
+            np.nan if result == "Error" else result
+            for result in (sci_calculate(x, operator) for x in a)
+        ], dtype=float)
+        assert np.allclose(sci_calculate_array(a, operator), expected, rtol=1e-12, equal_nan=True), operator
+
+
+def random_expression(rng, depth=0):
+    """Key list for a random well-formed expression."""
+    r = rng.random()
+    if depth > 3 or r < 0.4:
+        keys = list(rng.choice(["2", "30", "0.5", "45", "7", "100", "1.5"]))
+    elif r < 0.55:
+        keys = ["("] + random_expression(rng, depth + 1) + [")"]
+    elif r < 0.7:
+        keys = [rng.choice(FUNCTIONS)] + random_expression(rng, depth + 1)
+    elif r < 0.75:
+        keys = ["-"] + random_expression(rng, depth + 1)
+    else:
+        keys = random_expression(rng, depth + 1) + [rng.choice(OPERATORS)] + random_expression(rng, depth + 1)
+    if rng.random() < 0.1:
+        keys.append("%")
+    return keys
+
+
+def check_expressions(count=2000, seed=0):
+    """The incremental preview must agree with parsing the whole text, in both precisions.
+
+    Unfinished input (a trailing operator or open parentheses) is checked through
+    IncrementalExpression.evaluate(), which is what "=" uses.
+    """
+    rng = random.Random(seed)
+    compared = 0
+    for precise in (False, True):
+        for _ in range(count):
+            expression = IncrementalExpression(precise)
+            keys = random_expression(rng)
+            for key in keys[:rng.randint(1, len(keys))]:
+                if not expression.append(key):
+                    break
+            assert expression.preview() == expression.evaluate(), expression.text
+            if expression.text == expression.completed_text():
+                assert expression.preview() == evaluate(expression.text, precise), expression.text
+            compared += 1
+    # Decimal trig must not print series residue where the exact value is 0
+    for text in ("sin180", "cos90", "cos270", "tan180", "sin(90+90)", "sin360"):
+        assert evaluate(text, precise=True) == "0", text
+    return compared
+
+
+def benchmark_expressions(length=480):
+    keys = list("12+34*5-6/7+") * (length // 12)
+    for precise in (False, True):
+        label = "decimal" if precise else "float"
+        compile_expression.cache_clear()
+        started = time.perf_counter()
+        expression = IncrementalExpression(precise)
+        for key in keys:
+            expression.append(key)
+            expression.preview()
+        incremental = time.perf_counter() - started
+
+        # What a preview costs without incremental state: re-parse the text on every key
+        compile_expression.cache_clear()
+        started = time.perf_counter()
+        text = ""
+        for key in keys:
+            text += key
+            evaluate(text.rstrip("+-*/"), precise)
+        reparse = time.perf_counter() - started
+        print(f"expression preview ({label}): {len(keys) / incremental:10,.0f} keys/sec incremental, "
+              f"{len(keys) / reparse:10,.0f} keys/sec re-parsing")
+
+
+def benchmark(count=20_000, length=20):
+    sequences = random_sequences(count, length)
+    keystrokes = count * length
+
+    compared, diverged = check_sequences(sequences[:2000])
+    print(f"engine matches legacy on {compared} keystrokes ({diverged} sequences stopped at a legacy exception)")
+    check_arrays()
+    print("vectorized calculate/sci_calculate match the scalar functions")
+    print(f"expression preview matches full evaluation on {check_expressions()} expressions")
+
+    started = time.perf_counter()
+    for keys in sequences:
+        legacy = LegacyCalculator()
+        for key in keys:
+            try:
+                legacy.button_clicked(key)
+            except ValueError:
+                legacy = LegacyCalculator()
+    elapsed = time.perf_counter() - started
+    print(f"legacy logic:       {keystrokes / elapsed:12,.0f} keystrokes/sec")
+
+    started = time.perf_counter()
+    evaluate_sequences(sequences)
+    elapsed = time.perf_counter() - started
+    print(f"engine:             {keystrokes / elapsed:12,.0f} keystrokes/sec")
+
+    # One chained expression evaluated over a million operand sets
+    size = 1_000_000
+    rng = np.random.default_rng(1)
+    operands = [rng.uniform(-100, 100, size) for _ in range(4)]
+    operators = ["+", "*", "/"]
+    started = time.perf_counter()
+    evaluate_chain(operands, operators)
+    elapsed = time.perf_counter() - started
+    # Each evaluation stands for 3 operator keys + 4 operands + "="
+    print(f"vectorized chain:   {size * 8 / elapsed:12,.0f} keystrokes/sec (equivalent)")
+
+    benchmark_expressions()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,5 +1,8 @@
 import flet as ft
 
+from engine import CalculatorEngine
+from expression import IncrementalExpression
+
 
 class CalcButton(ft.ElevatedButton):
     def __init__(self, text, button_clicked, expand=1):
@@ -41,16 +44,25 @@ class SciCalcButton(CalcButton):
 class CalculatorApp(ft.Container):
     def __init__(self):
         super().__init__()
-        self.reset()
+        self.engine = CalculatorEngine()
+        # Expression mode: keys build a whole expression that is evaluated with precedence
+        self.expression = IncrementalExpression()
+        self.expression_mode = False
+        self.precise = False
+        self.last_value = "0"
 
         self.result = ft.Text(value="0", color=ft.colors.WHITE, size=20)
+        self.preview = ft.Text(value="", color=ft.colors.WHITE54, size=14)
+        self.mode = ft.Text(value="", color=ft.colors.WHITE54, size=12)
         self.width = 450  # Increase the width to accommodate more buttons
         self.bgcolor = ft.colors.BLACK
         self.border_radius = ft.border_radius.all(20)
         self.padding = 20
         self.content = ft.Column(
             controls=[
+                ft.Row(controls=[self.mode], alignment="start"),
                 ft.Row(controls=[self.result], alignment="end"),
+                ft.Row(controls=[self.preview], alignment="end"),
                 ft.Row(
                     controls=[
                         ft.Column(
@@ -65,6 +77,15 @@ class CalculatorApp(ft.Container):
                         ),
                         ft.Column(
                             controls=[
+                                ft.Row(
+                                    controls=[
+                                        ExtraActionButton(text="EXP", button_clicked=self.button_clicked),
+                                        ExtraActionButton(text="DEC", button_clicked=self.button_clicked),
+                                        ExtraActionButton(text="(", button_clicked=self.button_clicked),
+                                        ExtraActionButton(text=")", button_clicked=self.button_clicked),
+                                        ExtraActionButton(text="⌫", button_clicked=self.button_clicked),
+                                    ]
+                                ),
                                 ft.Row(
                                     controls=[
                                         ExtraActionButton(
@@ -123,80 +144,60 @@ class CalculatorApp(ft.Container):
 
     def button_clicked(self, e):
         data = e.control.data
-        print(f"Button clicked with data = {data}")
-        if self.result.value == "Error" or data == "AC":
-            self.result.value = "0"
-            self.reset()
-        elif data in ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "."):
-            if self.result.value == "0" or self.new_operand:
-                self.result.value = data
-                self.new_operand = False
-            else:
-                self.result.value += data
-        elif data in ("+", "-", "*", "/"):
-            self.result.value = self.calculate(
-                self.operand1, float(self.result.value), self.operator
-            )
-            self.operator = data
-            if self.result.value == "Error":
-                self.operand1 = 0
-            else:
-                self.operand1 = float(self.result.value)
-            self.new_operand = True
+        if data == "EXP":
+            self.expression_mode = not self.expression_mode
+            self.engine.clear()
+            self.expression.clear()
+            self.last_value = "0"
+        elif data == "DEC":
+            self.precise = not self.precise
+            self.expression.set_precise(self.precise)
+        elif self.expression_mode:
+            self.expression_clicked(data)
+        else:
+            self.engine.press(data)
+        self.refresh()
+
+    def expression_clicked(self, data):
+        if data == "AC":
+            self.expression.clear()
+            self.last_value = "0"
+        elif data == "⌫":
+            self.expression.backspace()
         elif data == "=":
-            self.result.value = self.calculate(
-                self.operand1, float(self.result.value), self.operator
-            )
-            self.reset()
-        elif data == "%":
-            self.result.value = float(self.result.value) / 100
-            self.reset()
+            value = self.expression.evaluate()
+            if not value:
+                return
+            self.expression.clear()
+            # Continue from the result when it can be typed back in (not "Error" or "1e-05")
+            for key in value:
+                if not self.expression.append(key):
+                    self.expression.clear()
+                    break
+            self.last_value = value
         elif data == "+/-":
-            if float(self.result.value) > 0:
-                self.result.value = "-" + str(self.result.value)
-            elif float(self.result.value) < 0:
-                self.result.value = str(self.format_number(abs(float(self.result.value))))
-        elif data in ("sin", "cos", "tan", "log", "√"):
-            self.result.value = self.sci_calculate(float(self.result.value), data)
-            self.reset()
-        self.update()
-
-    def sci_calculate(self, value, operator):
-        import math
-        if operator == "sin":
-            return self.format_number(math.sin(math.radians(value)))
-        elif operator == "cos":
-            return self.format_number(math.cos(math.radians(value)))
-        elif operator == "tan":
-            return self.format_number(math.tan(math.radians(value)))
-        elif operator == "log":
-            return self.format_number(math.log10(value))
-        elif operator == "√":
-            return self.format_number(math.sqrt(value))
-
-    def format_number(self, num):
-        if num % 1 == 0:
-            return int(num)
+            self.expression.toggle_sign()
         else:
-            return num
-
-    def calculate(self, operand1, operand2, operator):
-        if operator == "+":
-            return self.format_number(operand1 + operand2)
-        elif operator == "-":
-            return self.format_number(operand1 - operand2)
-        elif operator == "*":
-            return self.format_number(operand1 * operand2)
-        elif operator == "/":
-            if operand2 == 0:
-                return "Error"
+            # Keys that do not fit here (e.g. two operators in a row) are ignored
+            self.expression.append(data)
+
+    def refresh(self):
+        if self.expression_mode:
+            text = self.expression.text
+            if text:
+                self.result.value = text
+                self.preview.value = "= " + self.expression.preview()
             else:
-                return self.format_number(operand1 / operand2)
-
-    def reset(self):
-        self.operator = "+"
-        self.operand1 = 0
-        self.new_operand = True
+                self.result.value = self.last_value
+                self.preview.value = ""
+            self.mode.value = "EXP DEC" if self.precise else "EXP"
+        else:
+            self.result.value = self.engine.display
+            self.preview.value = ""
+            self.mode.value = ""
+        self.result.update()
+        self.preview.update()
+        self.mode.update()
 
 
 def main(page: ft.Page):
@@ -0,0 +1,189 @@
+import math
+
+import numpy as np
+
+DIGITS = ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", ".")
+OPERATORS = ("+", "-", "*", "/")
+SCI_OPERATORS = ("sin", "cos", "tan", "log", "√")
+
+
+def format_number(num):
+    if num % 1 == 0:
+        return int(num)
+    else:
+        return num
+
+
+def calculate(operand1, operand2, operator):
+    if operator == "+":
+        return format_number(operand1 + operand2)
+    elif operator == "-":
+        return format_number(operand1 - operand2)
+    elif operator == "*":
+        return format_number(operand1 * operand2)
+    elif operator == "/":
+        if operand2 == 0:
+            return "Error"
+        else:
+            return format_number(operand1 / operand2)
+
+
+def sci_calculate(value, operator):
+    try:
+        if operator == "sin":
+            return format_number(math.sin(math.radians(value)))
+        elif operator == "cos":
+            return format_number(math.cos(math.radians(value)))
+        elif operator == "tan":
+            return format_number(math.tan(math.radians(value)))
+        elif operator == "log":
+            return format_number(math.log10(value))
+        elif operator == "√":
+            return format_number(math.sqrt(value))
+    except ValueError:
+        # Out of domain, e.g. log(0) or √(-1)
+        return "Error"
+
+
+class CalculatorEngine:
+    """UI-free calculator state machine; behaves like the old CalculatorApp.button_clicked."""
+
+    def __init__(self):
+        self.value = "0"
+        self.reset()
+
+    def reset(self):
+        self.operator = "+"
+        self.operand1 = 0
+        self.new_operand = True
+
+    def clear(self):
+        self.value = "0"
+        self.reset()
+
+    @property
+    def display(self):
+        return str(self.value)
+
+    def press(self, data):
+        """Press one key and return the text to display."""
+        self._press_checked(data)
+        return self.display
+
+    def _press_checked(self, data):
+        try:
+            self._press(data)
+        except ValueError:
+            # Input that is not a number, e.g. "." or "1.2.3"
+            self.value = "Error"
+            self.reset()
+
+    def _press(self, data):
+        if self.value == "Error" or data == "AC":
+            self.value = "0"
+            self.reset()
+        elif data in DIGITS:
+            if self.value == "0" or self.new_operand:
+                self.value = data
+                self.new_operand = False
+            else:
+                self.value += data
+        elif data in OPERATORS:
+            self.value = calculate(self.operand1, float(self.value), self.operator)
+            self.operator = data
+            if self.value == "Error":
+                self.operand1 = 0
+            else:
+                self.operand1 = float(self.value)
+            self.new_operand = True
+        elif data == "=":
+            self.value = calculate(self.operand1, float(self.value), self.operator)
+            self.reset()
+        elif data == "%":
+            self.value = float(self.value) / 100
+            self.reset()
+        elif data == "+/-":
+            if float(self.value) > 0:
+                self.value = "-" + str(self.value)
+            elif float(self.value) < 0:
+                self.value = str(format_number(abs(float(self.value))))
+        elif data in SCI_OPERATORS:
+            self.value = sci_calculate(float(self.value), data)
+            self.reset()
+
+    def run(self, keys):
+        """Press every key in order and return the final display."""
+        press = self._press_checked
+        for key in keys:
+            press(key)
+        return self.display
+
+
+def evaluate_sequences(sequences):
+    """Evaluate each key sequence from a cleared state and return the final displays."""
+    engine = CalculatorEngine()
+    results = []
+    for keys in sequences:
+        engine.clear()
+        results.append(engine.run(keys))
+    return results
+
+
+# Vectorized evaluation over NumPy arrays. Errors are represented as NaN.
+
+def calculate_array(operand1, operand2, operator):
+    """Array version of calculate(); division by zero gives NaN."""
+    a = np.asarray(operand1, dtype=float)
+    b = np.asarray(operand2, dtype=float)
+    if operator == "+":
+        return a + b
+    elif operator == "-":
+        return a - b
+    elif operator == "*":
+        return a * b
+    elif operator == "/":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(b == 0, np.nan, a / np.where(b == 0, 1, b))
+    raise ValueError(f"unknown operator: {operator}")
+
+
+def sci_calculate_array(values, operator):
+    """Array version of sci_calculate(); out-of-domain input gives NaN."""
+    x = np.asarray(values, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if operator == "sin":
+            return np.sin(np.radians(x))
+        elif operator == "cos":
+            return np.cos(np.radians(x))
+        elif operator == "tan":
+            return np.tan(np.radians(x))
+        elif operator == "log":
+            return np.where(x > 0, np.log10(np.where(x > 0, x, 1)), np.nan)
+        elif operator == "√":
+            return np.where(x >= 0, np.sqrt(np.where(x >= 0, x, 0)), np.nan)
+    raise ValueError(f"unknown operator: {operator}")
+
+
+def evaluate_chain(operands, operators):
+    """Evaluate operands[0] operators[0] operands[1] ... left to right.
+
+    Like the calculator's immediate mode there is no operator precedence.
+    Elements that hit an error stay NaN.
+    """
+    if len(operands) != len(operators) + 1:
+        raise ValueError("operands must have exactly one more element than operators")
+    result = np.asarray(operands[0], dtype=float)
+    for operator, operand in zip(operators, operands[1:]):
+        result = calculate_array(result, operand, operator)
+    return result
+
+
+def to_display(values):
+    """Format results the way the calculator displays them; NaN becomes "Error"."""
+    x = np.asarray(values, dtype=float)
+    finite = np.isfinite(x)
+    # Like format_number, whole numbers are shown without a decimal point
+    is_int = finite & (np.mod(np.where(finite, x, 0), 1) == 0) & (np.abs(np.where(finite, x, 0)) < 2 ** 63)
+    out = np.where(np.isnan(x), "Error", x.astype(str)).astype(object)
+    out[is_int] = x[is_int].astype(np.int64).astype(str)
+    return out
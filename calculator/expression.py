@@ -0,0 +1,491 @@
+"""Expression mode: precedence parsing, compiled/cached expressions and incremental evaluation.
+
+Supported: numbers, + - * /, unary minus, parentheses, postfix % (divide by 100),
+and the prefix functions sin cos tan (degrees), log (base 10) and √.
+"""
+import math
+import re
+from decimal import Context, Decimal, InvalidOperation, localcontext
+from functools import lru_cache
+
+FUNCTIONS = ("sin", "cos", "tan", "log", "√")
+BINARY_PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2}
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(\d+\.?\d*|\.\d+)|(sin|cos|tan|log|√)|([-+*/%()]))")
+
+# Digits of precision used by the decimal backend
+DECIMAL_PRECISION = 50
+# Decimal results smaller than this are shown (and treated by tan) as zero
+ZERO_THRESHOLD = Decimal(10) ** -DECIMAL_PRECISION
+
+
+class EvaluationError(Exception):
+    pass
+
+
+class FloatBackend:
+    """Evaluates with Python floats and the math module."""
+
+    def number(self, text):
+        return float(text)
+
+    def add(self, a, b):
+        return a + b
+
+    def sub(self, a, b):
+        return a - b
+
+    def mul(self, a, b):
+        return a * b
+
+    def div(self, a, b):
+        if b == 0:
+            raise EvaluationError("division by zero")
+        return a / b
+
+    def neg(self, a):
+        return -a
+
+    def percent(self, a):
+        return a / 100
+
+    def function(self, name, a):
+        try:
+            if name == "sin":
+                return math.sin(math.radians(a))
+            elif name == "cos":
+                return math.cos(math.radians(a))
+            elif name == "tan":
+                return math.tan(math.radians(a))
+            elif name == "log":
+                return math.log10(a)
+            elif name == "√":
+                return math.sqrt(a)
+        except ValueError as e:
+            raise EvaluationError(str(e))
+        raise EvaluationError(f"unknown function: {name}")
+
+
+class DecimalBackend(FloatBackend):
+    """Evaluates with decimal.Decimal at DECIMAL_PRECISION digits."""
+
+    def __init__(self, precision=DECIMAL_PRECISION):
+        self.precision = precision
+        # A few guard digits; results are rounded to precision when displayed
+        self.context = Context(prec=precision + 5)
+
+    def number(self, text):
+        return Decimal(text)
+
+    def add(self, a, b):
+        return self.context.add(a, b)
+
+    def sub(self, a, b):
+        return self.context.subtract(a, b)
+
+    def mul(self, a, b):
+        return self.context.multiply(a, b)
+
+    def div(self, a, b):
+        if b == 0:
+            raise EvaluationError("division by zero")
+        return self.context.divide(a, b)
+
+    def neg(self, a):
+        return self.context.minus(a)
+
+    def percent(self, a):
+        return a.scaleb(-2, self.context)
+
+    def function(self, name, a):
+        with localcontext(self.context):
+            if name in ("sin", "cos", "tan"):
+                radians = self._radians(a)
+                if name == "sin":
+                    return self._sin(radians)
+                elif name == "cos":
+                    return self._cos(radians)
+                cos = self._cos(radians)
+                # cos(90°) comes out as a tiny residue rather than exactly 0
+                if abs(cos) < Decimal(10) ** -self.precision:
+                    raise EvaluationError("tan undefined")
+                return self._sin(radians) / cos
+            elif name == "log":
+                if a <= 0:
+                    raise EvaluationError("math domain error")
+                return a.log10()
+            elif name == "√":
+                if a < 0:
+                    raise EvaluationError("math domain error")
+                return a.sqrt()
+        raise EvaluationError(f"unknown function: {name}")
+
+    def _pi(self):
+        # Machin's formula: pi = 16 atan(1/5) - 4 atan(1/239)
+        return 16 * self._atan_inverse(5) - 4 * self._atan_inverse(239)
+
+    def _atan_inverse(self, x):
+        x = Decimal(x)
+        x2 = x * x
+        power = 1 / x
+        total = power
+        n = 1
+        sign = -1
+        eps = Decimal(10) ** -(self.precision + 3)
+        while power > eps:
+            power /= x2
+            n += 2
+            total += sign * power / n
+            sign = -sign
+        return total
+
+    def _radians(self, degrees):
+        # Reduce to [0, 360) first so the Taylor series converges quickly
+        return (degrees % 360) * self._pi() / 180
+
+    def _sin(self, x):
+        total, term, n = x, x, 1
+        eps = Decimal(10) ** -(self.precision + 3)
+        while abs(term) > eps:
+            term *= -x * x / ((n + 1) * (n + 2))
+            total += term
+            n += 2
+        return +total
+
+    def _cos(self, x):
+        total, term, n = Decimal(1), Decimal(1), 0
+        eps = Decimal(10) ** -(self.precision + 3)
+        while abs(term) > eps:
+            term *= -x * x / ((n + 1) * (n + 2))
+            total += term
+            n += 2
+        return +total
+
+
+FLOAT = FloatBackend()
+DECIMAL = DecimalBackend()
+
+
+def backend_for(precise):
+    return DECIMAL if precise else FLOAT
+
+
+# Tokenizer and compiler
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise SyntaxError(f"unexpected character at {position}: {text[position]!r}")
+        number, function, symbol = match.groups()
+        tokens.append(("num", number) if number else ("func", function) if function else ("op", symbol))
+        position = match.end()
+    return tokens
+
+
+def _compile(tokens):
+    """Shunting-yard over the tokens; returns the expression as a flat RPN program.
+
+    Prefix functions and unary minus bind tighter than any binary operator but
+    looser than postfix %, so sin 30% means sin(0.3) and -2% means -(0.02).
+    No recursion, so neither long chains nor deep nesting can overflow the stack.
+    """
+    program = []
+    ops = []
+    expect_operand = True
+
+    def pop_prefix():
+        while ops and (ops[-1] in FUNCTIONS or ops[-1] == "neg"):
+            program.append(ops.pop())
+
+    for kind, value in tokens:
+        if expect_operand:
+            if kind == "num":
+                program.append(("num", value))
+                expect_operand = False
+            elif kind == "func" or value == "(":
+                ops.append(value)
+            elif value == "-":
+                ops.append("neg")
+            elif value != "+":
+                raise SyntaxError(f"unexpected token: {value!r}")
+        elif value == "%":
+            program.append("%")
+        elif value in BINARY_PRECEDENCE:
+            pop_prefix()
+            while ops and ops[-1] in BINARY_PRECEDENCE and BINARY_PRECEDENCE[ops[-1]] >= BINARY_PRECEDENCE[value]:
+                program.append(ops.pop())
+            ops.append(value)
+            expect_operand = True
+        elif value == ")":
+            pop_prefix()
+            while ops and ops[-1] != "(":
+                program.append(ops.pop())
+                pop_prefix()
+            if not ops:
+                raise SyntaxError("unmatched )")
+            ops.pop()
+        else:
+            raise SyntaxError(f"unexpected token: {value!r}")
+
+    if expect_operand:
+        raise SyntaxError("missing operand")
+    while ops:
+        op = ops.pop()
+        if op == "(":
+            raise SyntaxError("missing )")
+        program.append(op)
+    return tuple(program)
+
+
+def run_program(program, backend):
+    """Evaluate a compiled RPN program with the given backend."""
+    values = []
+    for op in program:
+        if type(op) is tuple:
+            values.append(backend.number(op[1]))
+        elif op == "%":
+            values[-1] = backend.percent(values[-1])
+        elif op == "neg":
+            values[-1] = backend.neg(values[-1])
+        elif op in FUNCTIONS:
+            values[-1] = backend.function(op, values[-1])
+        else:
+            right = values.pop()
+            left = values.pop()
+            if op == "+":
+                values.append(backend.add(left, right))
+            elif op == "-":
+                values.append(backend.sub(left, right))
+            elif op == "*":
+                values.append(backend.mul(left, right))
+            else:
+                values.append(backend.div(left, right))
+    return values[-1]
+
+
+@lru_cache(maxsize=256)
+def compile_expression(text):
+    """Parse text once and return its RPN program (cached by text)."""
+    return _compile(tokenize(text))
+
+
+def evaluate(text, precise=False):
+    """Evaluate an expression string; returns the display text or "Error"."""
+    try:
+        return format_value(run_program(compile_expression(text), backend_for(precise)))
+    except (SyntaxError, EvaluationError, OverflowError, InvalidOperation):
+        return "Error"
+
+
+def format_value(value):
+    if isinstance(value, Decimal):
+        # Series residue such as sin(180°) ~ 1e-55 is zero at the displayed precision;
+        # the threshold is absolute because prec only limits significant digits
+        if abs(value) < ZERO_THRESHOLD:
+            return "0"
+        return format(Context(prec=DECIMAL_PRECISION).normalize(value), "f")
+    if value % 1 == 0:
+        return str(int(value))
+    return str(value)
+
+
+# Incremental evaluation
+
+class _State:
+    """Immutable shunting-yard state after one key.
+
+    values holds finished operands, ops holds pending operators, "(" markers and
+    prefix functions ("neg" for unary minus). Reductions happen as soon as
+    precedence allows, so both stacks stay shallow even for long inputs.
+    """
+    __slots__ = ("values", "ops", "number", "expect_operand", "error")
+
+    def __init__(self, values=(), ops=(), number="", expect_operand=True, error=False):
+        self.values = values
+        self.ops = ops
+        self.number = number
+        self.expect_operand = expect_operand
+        self.error = error
+
+
+class IncrementalExpression:
+    """Keeps a state per appended key so the preview updates in O(stack depth)."""
+
+    def __init__(self, precise=False):
+        self.backend = backend_for(precise)
+        self.clear()
+
+    def clear(self):
+        self.keys = []
+        self.states = [_State()]
+
+    @property
+    def text(self):
+        return "".join(self.keys)
+
+    def set_precise(self, precise):
+        keys = self.keys
+        self.backend = backend_for(precise)
+        self.clear()
+        for key in keys:
+            self.append(key)
+
+    def append(self, key):
+        """Append one key (digit, ".", operator, "(", ")", "%" or function name)."""
+        state = self._step(self.states[-1], key)
+        if state is None:
+            return False
+        self.keys.append(key)
+        self.states.append(state)
+        return True
+
+    def toggle_sign(self):
+        """Negate the number being typed: 5 -> -5, 2*3 -> 2*-3 and back again."""
+        start = len(self.keys)
+        while start and (self.keys[start - 1].isdigit() or self.keys[start - 1] == "."):
+            start -= 1
+        if start == len(self.keys):
+            return False
+        # A "-" typed where an operand was expected is a unary minus we can drop
+        if start and self.keys[start - 1] == "-" and self.states[start - 1].expect_operand:
+            position, keys = start - 1, self.keys[start:]
+        else:
+            position, keys = start, ["-"] + self.keys[start:]
+        old_keys, old_states = self.keys, self.states
+        self.keys, self.states = self.keys[:position], self.states[:position + 1]
+        for key in keys:
+            if not self.append(key):
+                self.keys, self.states = old_keys, old_states
+                return False
+        return True
+
+    def backspace(self):
+        if self.keys:
+            self.keys.pop()
+            self.states.pop()
+
+    def preview(self):
+        """Value of the expression typed so far, closing any open parentheses."""
+        state = self.states[-1]
+        if state.error:
+            return "Error"
+        try:
+            state = self._finish_number(state)
+            values, ops = list(state.values), list(state.ops)
+            if state.expect_operand:
+                # Ignore a trailing operator, "(" or function that has no operand yet
+                while ops:
+                    if ops.pop() in BINARY_PRECEDENCE:
+                        break
+            while True:
+                self._apply_prefix(values, ops)
+                if not ops:
+                    break
+                op = ops.pop()
+                if op != "(":
+                    self._apply(op, values)
+            return format_value(values[-1]) if values else ""
+        except (EvaluationError, OverflowError, InvalidOperation, IndexError):
+            return "Error"
+
+    def completed_text(self):
+        """The text as the preview reads it: trailing operators dropped, open "(" closed."""
+        end = len(self.keys)
+        # states[end] is the state after the first `end` keys
+        while end and self.states[end].expect_operand and not self.states[end].number:
+            end -= 1
+        if end == 0:
+            return ""
+        return "".join(self.keys[:end]) + ")" * self.states[end].ops.count("(")
+
+    def evaluate(self):
+        """Full evaluation through the compiled-expression cache; agrees with preview()."""
+        text = self.completed_text()
+        if not text:
+            return ""
+        return evaluate(text, self.backend is DECIMAL)
+
+    # -- state transitions --
+
+    def _step(self, state, key):
+        if state.error:
+            return None
+        try:
+            if key.isdigit() or key == ".":
+                if key == "." and "." in state.number:
+                    return None
+                if not state.expect_operand and not state.number:
+                    return None
+                return _State(state.values, state.ops, state.number + key, True, False)
+
+            if key in FUNCTIONS or key == "(":
+                if not state.expect_operand or state.number:
+                    return None
+                return _State(state.values, state.ops + (key,), "", True)
+
+            state = self._finish_number(state)
+
+            if key in BINARY_PRECEDENCE:
+                if state.expect_operand:
+                    if key == "-":
+                        return _State(state.values, state.ops + ("neg",), "", True)
+                    return None
+                values, ops = list(state.values), list(state.ops)
+                self._apply_prefix(values, ops)
+                while ops and ops[-1] in BINARY_PRECEDENCE and BINARY_PRECEDENCE[ops[-1]] >= BINARY_PRECEDENCE[key]:
+                    self._apply(ops.pop(), values)
+                return _State(tuple(values), tuple(ops) + (key,), "", True)
+
+            if key == ")":
+                if state.expect_operand or "(" not in state.ops:
+                    return None
+                values, ops = list(state.values), list(state.ops)
+                self._apply_prefix(values, ops)
+                while ops[-1] != "(":
+                    self._apply(ops.pop(), values)
+                    self._apply_prefix(values, ops)
+                ops.pop()
+                return _State(tuple(values), tuple(ops), "", False)
+
+            if key == "%":
+                if state.expect_operand:
+                    return None
+                values = list(state.values)
+                values[-1] = self.backend.percent(values[-1])
+                return _State(tuple(values), state.ops, "", False)
+        except (EvaluationError, OverflowError, InvalidOperation):
+            return _State(error=True)
+        return None
+
+    def _finish_number(self, state):
+        """Turn the number being typed into an operand.
+
+        Prefix functions are applied later, once a following "%" has had its turn,
+        to match the parser where sin 30% means sin(0.3).
+        """
+        if not state.number:
+            return state
+        if state.number == ".":
+            raise EvaluationError("incomplete number")
+        return _State(state.values + (self.backend.number(state.number),), state.ops, "", False)
+
+    def _apply_prefix(self, values, ops):
+        while ops and (ops[-1] in FUNCTIONS or ops[-1] == "neg"):
+            op = ops.pop()
+            values[-1] = self.backend.neg(values[-1]) if op == "neg" else self.backend.function(op, values[-1])
+
+    def _apply(self, op, values):
+        right = values.pop()
+        left = values.pop()
+        if op == "+":
+            values.append(self.backend.add(left, right))
+        elif op == "-":
+            values.append(self.backend.sub(left, right))
+        elif op == "*":
+            values.append(self.backend.mul(left, right))
+        else:
+            values.append(self.backend.div(left, right))
@@ -1,6 +1,8 @@
 import requests
 import flet as ft
 
+import search
+
 # 地域リストのエンドポイント
 AREA_LIST_URL = "http://www.jma.go.jp/bosai/common/const/area.json"
 FORECAST_URL_TEMPLATE = "https://www.jma.go.jp/bosai/forecast/data/forecast/{region_code}.json"
@@ -56,17 +58,23 @@ def main(page: ft.Page):
         return
 
     region_hierarchy = create_region_hierarchy(area_data)
+    # 地域名の検索索引（area.jsonが変わったときだけ作り直す）
+    search_index = search.load_index(area_data)
 
     # UIコンポーネント
     selected_region = ft.Text("")
     selected_office = ft.Text("")
     office_display = ft.ListView()
     forecast_display = ft.Column()
+    search_results = ft.ListView()
 
     # 地方を選択する関数
     def select_region(e):
-        region_code = e.control.data["code"]
-        region_name = e.control.data["name"]
+        show_region(e.control.data["code"])
+
+    # 地方の府県リストを表示する関数
+    def show_region(region_code):
+        region_name = region_hierarchy[region_code]["name"]
         selected_region.value = f"選択中の地方: {region_name}"
         selected_office.value = ""
         office_display.controls.clear()
@@ -85,7 +93,10 @@ def main(page: ft.Page):
 
     # 都道府県を選択する関数
     def select_office(e):
-        office = e.control.data
+        show_office(e.control.data)
+
+    # 府県の天気予報を表示する関数
+    def show_office(office):
         selected_office.value = f"選択中の地域: {office['name']}"
         try:
             forecast_data = get_forecast(office["code"])
@@ -141,6 +152,30 @@ def main(page: ft.Page):
 
         page.update()
 
+    # 検索欄に入力するたびに候補を表示する関数
+    def search_changed(e):
+        search_results.controls.clear()
+        for entry in search.search_areas(search_index, e.control.value, limit=10):
+            search_results.controls.append(
+                ft.ListTile(
+                    title=ft.Text(search.result_label(entry)),
+                    data=entry,
+                    on_click=select_search_result,
+                    dense=True,
+                )
+            )
+        page.update()
+
+    # 検索結果を選んだら、その府県の天気予報まで移動する関数
+    def select_search_result(e):
+        entry = e.control.data
+        search_results.controls.clear()
+        if entry["center_code"] in region_hierarchy:
+            show_region(entry["center_code"])
+        if entry["office_code"]:
+            office_name = area_data["offices"][entry["office_code"]]["name"]
+            show_office({"name": office_name, "code": entry["office_code"]})
+
     # 地方リストをリスト表示
     region_list_tiles = [
         ft.ListTile(
@@ -160,6 +195,8 @@ def main(page: ft.Page):
                     padding=ft.padding.all(10),
                     content=ft.Column(
                         [
+                            ft.TextField(label="地域名で検索", on_change=search_changed),
+                            search_results,
                             ft.Text("地方を選択してください", size=20, weight="bold"),
                             ft.ListView(controls=region_list_tiles, expand=True, height=300),
                             ft.Container(content=selected_region, padding=10),
@@ -3,6 +3,8 @@ import sqlite3
 import flet as ft
 from datetime import datetime, timedelta
 
+import search
+
 # API URL
 AREA_LIST_URL = "http://www.jma.go.jp/bosai/common/const/area.json"
 FORECAST_URL_TEMPLATE = "https://www.jma.go.jp/bosai/forecast/data/forecast/{area_code}.json"
@@ -76,6 +78,9 @@ def insert_area_data():
     conn.commit()
     conn.close()
 
+    # 地域名の検索索引を保存（area.jsonが変わったときだけ作り直す）
+    search.load_index(area_data)
+
 def get_forecast(area_code):
     response = requests.get(FORECAST_URL_TEMPLATE.format(area_code=area_code))
     response.raise_for_status()
@@ -125,6 +130,8 @@ def main(page: ft.Page):
     cursor = conn.cursor()
     cursor.execute('SELECT region_id, region_name FROM region')
     regions = cursor.fetchall()
+    # 地域名の検索索引（insert_area_dataで保存したもの）
+    _, search_index = search.read_cache()
 
     selected_region = ft.Text("")
     selected_office = ft.Text("")
@@ -139,9 +146,12 @@ def main(page: ft.Page):
         options=[],
         on_change=lambda e: update_forecast(e.data)
     )
+    search_results = ft.Column(spacing=0)
 
     def select_region(e):
-        region_id = e.data
+        show_region(e.data)
+
+    def show_region(region_id):
         selected_region.value = f"選択中の地方: {dict(regions)[region_id]}"
         selected_office.value = ""
         office_dropdown.options = []
@@ -155,8 +165,10 @@ def main(page: ft.Page):
         page.update()
 
     def select_office(e):
+        show_office(e.data)
+
+    def show_office(office_code):
         forecast_display.controls.clear()
-        office_code = e.data
         cursor.execute('SELECT area_id, area_name FROM area WHERE prefecture_id = ?', (office_code,))
         areas = cursor.fetchall()
 
@@ -237,6 +249,35 @@ def main(page: ft.Page):
             ] or [ft.Text("天気情報がありません")])
         page.update()
 
+    # 検索欄に入力するたびに候補を表示する関数（DBには問い合わせない）
+    def search_changed(e):
+        search_results.controls.clear()
+        if search_index is not None:
+            for entry in search.search_areas(search_index, e.control.value, limit=10):
+                search_results.controls.append(
+                    ft.ListTile(
+                        title=ft.Text(search.result_label(entry), size=13),
+                        data=entry,
+                        on_click=select_search_result,
+                        dense=True,
+                    )
+                )
+        page.update()
+
+    # 検索結果を選んだら、ドロップダウンを合わせて最初の日付の天気予報を表示する関数
+    def select_search_result(e):
+        entry = e.control.data
+        search_results.controls.clear()
+        if entry["center_code"] in dict(regions):
+            region_dropdown.value = entry["center_code"]
+            show_region(entry["center_code"])
+        if entry["office_code"]:
+            office_dropdown.value = entry["office_code"]
+            show_office(entry["office_code"])
+            if date_dropdown.options:
+                date_dropdown.value = date_dropdown.options[0].key
+                update_forecast(date_dropdown.value)
+
     region_dropdown = ft.Dropdown(
         width=200,
         label="地方を選択",
@@ -252,6 +293,8 @@ def main(page: ft.Page):
         padding=ft.padding.all(10),
         content=ft.Column(
             [
+                ft.TextField(label="地域名で検索", width=200, on_change=search_changed),
+                search_results,
                 region_dropdown,
                 selected_region,
                 office_dropdown,
@@ -0,0 +1,180 @@
+"""地域名（地方・府県・一次細分区域・市町村など）のインクリメンタル検索
+
+area.json のすべての名前（読みがな・英語名を含む）から前方一致・部分一致の索引を作り、
+入力のたびに順位付きの候補を返す。索引は area.json のハッシュをキーにして保存し、
+area.json の内容が変わったときだけ作り直す。
+"""
+import hashlib
+import json
+import os
+import pickle
+import unicodedata
+
+# 索引の保存先
+INDEX_CACHE_PATH = "area_index.pickle"
+# 索引の作り方を変えたら上げる（古い保存ファイルを使わないようにする）
+INDEX_VERSION = 1
+
+# (area.jsonのキー, 表示名) 上から順に優先して表示する
+AREA_LEVELS = [
+    ("centers", "地方"),
+    ("offices", "府県"),
+    ("class10s", "地域"),
+    ("class15s", "地域"),
+    ("class20s", "市町村"),
+]
+
+# この文字数までの前方一致は索引から直接引く（それより長い入力は絞り込んで確認する）
+MAX_PREFIX_LENGTH = 8
+# 部分一致に使うn-gramの長さ
+GRAM_LENGTH = 2
+
+
+def normalize(text):
+    """検索用に表記をそろえる関数（全角半角・大文字小文字・カタカナをひらがなに統一）"""
+    text = unicodedata.normalize("NFKC", text).lower().replace(" ", "")
+    return "".join(chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c for c in text)
+
+
+def area_hash(area_data):
+    """area.jsonの内容のハッシュ（索引の保存キー）を計算する関数"""
+    digest = hashlib.sha256(f"{INDEX_VERSION}:".encode())
+    digest.update(json.dumps(area_data, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def find_office(area_data, code):
+    """親をたどって、その地域の予報を出している府県（office）のコードを返す関数"""
+    for _ in range(len(AREA_LEVELS)):
+        if code in area_data["offices"]:
+            return code
+        for level in ("class10s", "class15s", "class20s"):
+            if code in area_data.get(level, {}):
+                code = area_data[level][code].get("parent")
+                break
+        else:
+            return None
+    return None
+
+
+def build_index(area_data):
+    """area.jsonから検索索引を作る関数"""
+    offices = area_data["offices"]
+    entries = []
+    for rank, (level, kind) in enumerate(AREA_LEVELS):
+        for code, item in area_data.get(level, {}).items():
+            if level == "centers":
+                office_code = None
+                center_code = code
+            else:
+                office_code = code if level == "offices" else find_office(area_data, item.get("parent"))
+                if office_code is None:
+                    continue
+                center_code = offices[office_code].get("parent")
+            keys = {normalize(item[field]) for field in ("name", "kana", "enName") if item.get(field)}
+            entries.append({
+                "name": item["name"],
+                "kind": kind,
+                "code": code,
+                "office_code": office_code,
+                "office_name": offices[office_code]["name"] if office_code else None,
+                "center_code": center_code,
+                "keys": tuple(sorted(keys)),
+                "rank": (rank, len(item["name"]), code),
+            })
+    # 番号の小さい順 = 表示の優先順 にしておくと、索引の一覧がそのまま順位順になる
+    entries.sort(key=lambda entry: entry["rank"])
+
+    exact = {}
+    prefixes = {}
+    grams = {}
+    for entry_id, entry in enumerate(entries):
+        entry_prefixes = set()
+        entry_grams = set()
+        for key in entry["keys"]:
+            exact.setdefault(key, []).append(entry_id)
+            entry_prefixes.update(key[:i] for i in range(1, min(len(key), MAX_PREFIX_LENGTH) + 1))
+            entry_grams.update(key)
+            entry_grams.update(key[i:i + GRAM_LENGTH] for i in range(len(key) - GRAM_LENGTH + 1))
+        for prefix in entry_prefixes:
+            prefixes.setdefault(prefix, []).append(entry_id)
+        for gram in entry_grams:
+            grams.setdefault(gram, []).append(entry_id)
+
+    return {
+        "entries": entries,
+        "exact": {key: tuple(ids) for key, ids in exact.items()},
+        "prefixes": {key: tuple(ids) for key, ids in prefixes.items()},
+        "grams": {key: tuple(ids) for key, ids in grams.items()},
+    }
+
+
+def read_cache(cache_path=INDEX_CACHE_PATH):
+    """保存済みの索引を (ハッシュ, 索引) で返す関数（なければ (None, None)）"""
+    if not os.path.exists(cache_path):
+        return None, None
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        return cached["hash"], cached["index"]
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError):
+        return None, None
+
+
+def load_index(area_data, cache_path=INDEX_CACHE_PATH):
+    """保存済みの索引を読み込む関数（area.jsonが変わっていれば作り直して保存する）"""
+    key = area_hash(area_data)
+    cached_key, index = read_cache(cache_path)
+    if cached_key == key:
+        return index
+
+    index = build_index(area_data)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"hash": key, "index": index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return index
+
+
+def search_areas(index, query, limit=20):
+    """入力に一致する地域を 完全一致 → 前方一致 → 部分一致 の順に返す関数"""
+    query = normalize(query)
+    if not query:
+        return []
+    entries = index["entries"]
+    found = []
+    seen = set()
+
+    def add(entry_ids, check=None):
+        for entry_id in entry_ids:
+            if len(found) >= limit:
+                return
+            if entry_id in seen:
+                continue
+            if check is not None and not any(check(key) for key in entries[entry_id]["keys"]):
+                continue
+            seen.add(entry_id)
+            found.append(entry_id)
+
+    add(index["exact"].get(query, ()))
+    if len(query) <= MAX_PREFIX_LENGTH:
+        add(index["prefixes"].get(query, ()))
+    else:
+        add(index["prefixes"].get(query[:MAX_PREFIX_LENGTH], ()), lambda key: key.startswith(query))
+
+    if len(found) < limit:
+        if len(query) <= GRAM_LENGTH:
+            add(index["grams"].get(query, ()))
+        else:
+            # 一番候補の少ないn-gramで絞り込み、実際に含まれているか確認する
+            postings = [index["grams"].get(query[i:i + GRAM_LENGTH], ()) for i in range(len(query) - GRAM_LENGTH + 1)]
+            add(min(postings, key=len), lambda key: query in key)
+
+    return [entries[entry_id] for entry_id in found]
+
+
+def result_label(entry):
+    """候補リストに表示する文字列を作る関数"""
+    if entry["office_name"] and entry["office_name"] != entry["name"]:
+        return f"{entry['name']}（{entry['kind']}・{entry['office_name']}）"
+    return f"{entry['name']}（{entry['kind']}）"
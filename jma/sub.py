@@ -1,6 +1,8 @@
 import requests
 import flet as ft
 
+import search
+
 # 地域リストのエンドポイント
 AREA_LIST_URL = "http://www.jma.go.jp/bosai/common/const/area.json"
 FORECAST_URL_TEMPLATE = "https://www.jma.go.jp/bosai/forecast/data/forecast/{region_code}.json"
@@ -90,17 +92,23 @@ def main(page: ft.Page):
         return
 
     region_hierarchy = create_region_hierarchy(area_data)
+    # 地域名の検索索引（area.jsonが変わったときだけ作り直す）
+    search_index = search.load_index(area_data)
 
     # UIコンポーネント
     selected_region = ft.Text("")
     selected_office = ft.Text("")
     forecast_display = ft.Column(spacing=20)
+    search_results = ft.Column(spacing=0)
     
     office_dropdown = ft.Dropdown()
 
     # 地方を選択する関数
     def select_region(e):
-        region_code = e.data
+        show_region(e.data)
+
+    # 地方の府県をドロップダウンに入れる関数
+    def show_region(region_code):
         selected_region.value = f"選択中の地方: {region_hierarchy[region_code]['name']}"
         selected_office.value = ""
         office_dropdown.options = []
@@ -114,10 +122,13 @@ def main(page: ft.Page):
 
     # 都道府県を選択する関数
     def select_office(e):
+        show_office(e.data)
+
+    # 府県の天気予報を表示する関数
+    def show_office(office_code):
         forecast_display.controls.clear()
 
-        office_code = e.data
-        selected_office.value = f"選択中の地域: {next((office['name'] for center in region_hierarchy.values() for office in center['offices'] if office['code'] == office_code), '')}"
+        selected_office.value = f"選択中の地域: {area_data['offices'].get(office_code, {}).get('name', '')}"
 
         try:
             forecast_data = get_forecast(office_code)
@@ -184,6 +195,31 @@ def main(page: ft.Page):
 
         page.update()
 
+    # 検索欄に入力するたびに候補を表示する関数
+    def search_changed(e):
+        search_results.controls.clear()
+        for entry in search.search_areas(search_index, e.control.value, limit=10):
+            search_results.controls.append(
+                ft.ListTile(
+                    title=ft.Text(search.result_label(entry), size=13),
+                    data=entry,
+                    on_click=select_search_result,
+                    dense=True,
+                )
+            )
+        page.update()
+
+    # 検索結果を選んだら、ドロップダウンを合わせてその府県の天気予報を表示する関数
+    def select_search_result(e):
+        entry = e.control.data
+        search_results.controls.clear()
+        if entry["center_code"] in region_hierarchy:
+            region_dropdown.value = entry["center_code"]
+            show_region(entry["center_code"])
+        if entry["office_code"]:
+            office_dropdown.value = entry["office_code"]
+            show_office(entry["office_code"])
+
     # 地方リストのドロップダウン
     region_dropdown = ft.Dropdown(
         options=[ft.dropdown.Option(code, center["name"]) for code, center in region_hierarchy.items()],
@@ -200,6 +236,8 @@ def main(page: ft.Page):
         padding=ft.padding.all(10),
         content=ft.Column(
             [
+                ft.TextField(label="地域名で検索", on_change=search_changed),
+                search_results,
                 ft.Text("地方を選択", size=20, weight="bold"),
                 region_dropdown,
                 selected_region,
@@ -0,0 +1,177 @@
+import pandas as pd
+
+# 平常運転以外を異常として扱う
+NORMAL_STATUS = '平常運転'
+
+# 観測している時間帯
+OBSERVED_HOURS = (7, 8, 12, 13, 17, 18, 19)
+
+# 路線 × 日付 × 時 × 運行状況ごとの件数を保持する集計テーブル
+# train_dataへの挿入時にトリガーで1件ずつ加算する
+ROLLUP_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS train_rollup (
+    area TEXT,
+    line TEXT,
+    date DATE,
+    hour INTEGER,
+    status TEXT,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY(line, date, hour, status)
+);
+CREATE INDEX IF NOT EXISTS idx_train_rollup_status ON train_rollup(status);
+CREATE TRIGGER IF NOT EXISTS train_rollup_insert AFTER INSERT ON train_data
+BEGIN
+    INSERT INTO train_rollup (area, line, date, hour, status, count)
+    VALUES (NEW.area, NEW.line, NEW.date, CAST(substr(NEW.time, 1, 2) AS INTEGER), NEW.status, 1)
+    ON CONFLICT(line, date, hour, status) DO UPDATE SET count = count + 1;
+END;
+'''
+
+
+def init_rollups(cursor):
+    """集計テーブルとトリガーを作成し、既存データがあれば集計する関数"""
+    cursor.executescript(ROLLUP_SCHEMA)
+    cursor.execute('SELECT EXISTS(SELECT 1 FROM train_rollup)')
+    if not cursor.fetchone()[0]:
+        rebuild_rollups(cursor)
+
+
+def rebuild_rollups(cursor):
+    """train_dataから集計テーブルを作り直す関数"""
+    cursor.execute('DELETE FROM train_rollup')
+    cursor.execute('''
+    INSERT INTO train_rollup (area, line, date, hour, status, count)
+    SELECT area, line, date, CAST(substr(time, 1, 2) AS INTEGER), status, COUNT(*)
+    FROM train_data
+    GROUP BY line, date, CAST(substr(time, 1, 2) AS INTEGER), status
+    ''')
+
+
+def abnormal_by_line(conn):
+    """路線ごとの異常発生回数を返す関数"""
+    sql = """
+    SELECT line, SUM(count) as count
+    FROM train_rollup
+    WHERE status != ?
+    GROUP BY line
+    ORDER BY count DESC
+    """
+    return pd.read_sql(sql, conn, params=(NORMAL_STATUS,))
+
+
+def abnormal_by_hour(conn, hours=OBSERVED_HOURS):
+    """時間ごとの異常発生回数を返す関数"""
+    placeholders = ','.join('?' * len(hours))
+    sql = f"""
+    SELECT hour, SUM(count) as count
+    FROM train_rollup
+    WHERE status != ?
+        AND hour IN ({placeholders})
+    GROUP BY hour
+    ORDER BY hour
+    """
+    return pd.read_sql(sql, conn, params=(NORMAL_STATUS, *hours))
+
+
+def abnormal_by_time_band(conn, hours=OBSERVED_HOURS):
+    """時間帯カテゴリごとの異常発生回数を返す関数"""
+    placeholders = ','.join('?' * len(hours))
+    sql = f"""
+    SELECT t.band as time_category, SUM(r.count) as count
+    FROM train_rollup r
+    JOIN time_band t ON t.hour = r.hour
+    WHERE r.status != ?
+        AND r.hour IN ({placeholders})
+    GROUP BY t.band
+    """
+    return pd.read_sql(sql, conn, params=(NORMAL_STATUS, *hours))
+
+
+def line_status_counts(conn, lines=None):
+    """路線 × 異常種類ごとの件数を返す関数（linesで路線を絞り込める）"""
+    params = [NORMAL_STATUS]
+    line_filter = ''
+    if lines is not None:
+        lines = list(lines)
+        line_filter = f"AND line IN ({','.join('?' * len(lines))})"
+        params.extend(lines)
+    sql = f"""
+    SELECT line, status, SUM(count) as count
+    FROM train_rollup
+    WHERE status != ?
+        {line_filter}
+    GROUP BY line, status
+    """
+    return pd.read_sql(sql, conn, params=params)
+
+
+def line_status_pivot(conn, lines=None):
+    """路線 × 異常種類のピボットテーブルを返す関数"""
+    return pd.pivot_table(
+        line_status_counts(conn, lines),
+        values='count',
+        index='line',
+        columns='status',
+        aggfunc='sum',
+        fill_value=0
+    )
+
+
+def area_status_counts(conn, categories=('都心', '郊外')):
+    """エリアカテゴリ × 異常種類ごとの件数を返す関数"""
+    placeholders = ','.join('?' * len(categories))
+    sql = f"""
+    SELECT d.category as area, r.status, SUM(r.count) as count
+    FROM train_rollup r
+    JOIN line_dim d ON d.line = r.line
+    WHERE r.status != ?
+        AND d.category IN ({placeholders})
+    GROUP BY d.category, r.status
+    """
+    return pd.read_sql(sql, conn, params=(NORMAL_STATUS, *categories))
+
+
+def area_status_pivot(conn, categories=('都心', '郊外')):
+    """エリアカテゴリ × 異常種類のピボットテーブルを返す関数"""
+    return pd.pivot_table(
+        area_status_counts(conn, categories),
+        values='count',
+        index='area',
+        columns='status',
+        aggfunc='sum',
+        fill_value=0
+    )
+
+
+def cause_breakdown(conn):
+    """異常種類ごとの件数と割合を返す関数"""
+    sql = """
+    SELECT
+        status,
+        SUM(count) as count,
+        SUM(count) * 100.0 / SUM(SUM(count)) OVER () as percentage
+    FROM train_rollup
+    WHERE status != ?
+    GROUP BY status
+    ORDER BY count DESC
+    """
+    return pd.read_sql(sql, conn, params=(NORMAL_STATUS,))
+
+
+def line_importance(conn):
+    """路線ごとの異常件数・影響日数・重要度スコアを返す関数"""
+    sql = """
+    SELECT
+        line,
+        SUM(count) as abnormal_count,
+        COUNT(DISTINCT date) as affected_days
+    FROM train_rollup
+    WHERE status != ?
+    GROUP BY line
+    """
+    importance = pd.read_sql(sql, conn, params=(NORMAL_STATUS,))
+    importance['score'] = (
+        importance['abnormal_count'] / importance['abnormal_count'].max() +
+        importance['affected_days'] / importance['affected_days'].max()
+    ) / 2
+    return importance
@@ -0,0 +1,191 @@
+"""運行情報の詳細文（detail）の全文検索と原因分類
+
+detail を FTS5（trigramトークナイザー）で索引し、異常時の行に原因カテゴリを付ける。
+trigramトークナイザーは SQLite 3.34 以降が必要（使えない環境では索引を作らずLIKEで検索する）。
+"""
+import sqlite3
+
+import pandas as pd
+
+from train.analytics import NORMAL_STATUS
+
+# 原因カテゴリ → detailに含まれるキーワード
+CAUSE_KEYWORDS = {
+    '人身事故': ['人身事故'],
+    '強風': ['強風', '風速規制'],
+    '大雨': ['大雨', '雨量規制', '降雨'],
+    '雪': ['大雪', '降雪', '積雪', '雪の影響'],
+    '地震': ['地震'],
+    '車両点検': ['車両点検', '車両の点検', '車両故障', '車両トラブル'],
+    '信号・設備': ['信号', '設備点検', '設備故障', '架線', '停電', '線路点検', '線路の点検', 'ポイント故障'],
+    '線路内立ち入り': ['線路内', '立ち入り', '線路に人'],
+    '急病人': ['急病人', '救護'],
+    '踏切': ['踏切'],
+    '動物': ['動物', '鹿と', 'シカと', '熊と', 'イノシシ'],
+    '倒木・落石': ['倒木', '落石', '支障物'],
+    '混雑': ['混雑'],
+}
+
+# trigramトークナイザーは3文字未満の語を索引で検索できないため、
+# 短い語は対象行を絞り込んだうえで train_data.detail に LIKE をかける
+MIN_MATCH_LENGTH = 3
+
+CAUSE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS train_causes (
+    cause TEXT,
+    train_id INTEGER,
+    PRIMARY KEY(cause, train_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_train_causes_train_id ON train_causes(train_id);
+CREATE TABLE IF NOT EXISTS cause_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_id INTEGER
+);
+INSERT OR IGNORE INTO cause_state (id, last_id) VALUES (1, 0);
+'''
+
+FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS train_detail_fts USING fts5(
+    detail, content='train_data', content_rowid='id', tokenize='trigram'
+)
+'''
+
+# 全文検索索引をtrain_dataに追従させるトリガー（索引を作れたときだけ作成する）
+FTS_TRIGGERS = '''
+CREATE TRIGGER IF NOT EXISTS train_detail_fts_insert AFTER INSERT ON train_data
+BEGIN
+    INSERT INTO train_detail_fts (rowid, detail) VALUES (NEW.id, NEW.detail);
+END;
+CREATE TRIGGER IF NOT EXISTS train_detail_fts_delete AFTER DELETE ON train_data
+BEGIN
+    INSERT INTO train_detail_fts (train_detail_fts, rowid, detail) VALUES ('delete', OLD.id, OLD.detail);
+END;
+CREATE TRIGGER IF NOT EXISTS train_detail_fts_update AFTER UPDATE OF detail ON train_data
+BEGIN
+    INSERT INTO train_detail_fts (train_detail_fts, rowid, detail) VALUES ('delete', OLD.id, OLD.detail);
+    INSERT INTO train_detail_fts (rowid, detail) VALUES (NEW.id, NEW.detail);
+END;
+'''
+
+
+def init_causes(cursor):
+    """全文検索索引と原因分類テーブルを作成する関数（索引が追従していなければ作り直す）"""
+    cursor.executescript(CAUSE_SCHEMA)
+    # トリガーがなければ索引は追従していない（新規作成か、索引を使えなかった期間がある）
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE name = 'train_detail_fts_insert')")
+    in_sync = cursor.fetchone()[0]
+    error = None
+    try:
+        cursor.execute(FTS_SCHEMA)
+    except sqlite3.OperationalError as e:
+        error = e
+    if not has_fts(cursor):
+        # 索引は分析用なので、作れなくてもデータの収集は止めない
+        # （別の環境で作った索引のトリガーが残っていると挿入に失敗するため取り除く）
+        print(f"Full-text index unavailable ({error or 'cannot open train_detail_fts'}); detail search uses LIKE")
+        for trigger in ('insert', 'delete', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS train_detail_fts_{trigger}')
+        return
+    cursor.executescript(FTS_TRIGGERS)
+    if not in_sync:
+        cursor.execute("INSERT INTO train_detail_fts (train_detail_fts) VALUES ('rebuild')")
+
+
+def has_fts(cursor):
+    """全文検索索引を使えるかを返す関数（索引がない・このSQLiteで開けないときはFalse）"""
+    try:
+        cursor.execute('SELECT 1 FROM train_detail_fts LIMIT 0')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def _keyword_query(keyword, use_fts=True):
+    """キーワードに一致する行を探すFROM句・条件・条件値を返す関数（train_dataの別名はd）"""
+    if use_fts and len(keyword) >= MIN_MATCH_LENGTH:
+        # 語句検索として渡す（"は二重にしてエスケープ）
+        return (
+            'train_detail_fts f JOIN train_data d ON d.id = f.rowid',
+            'train_detail_fts MATCH ?',
+            '"' + keyword.replace('"', '""') + '"',
+        )
+    # 索引を使えない（短い語・索引なし）ので、train_dataを直接検索する
+    return 'train_data d', 'd.detail LIKE ?', f'%{keyword}%'
+
+
+def classify_causes(cursor):
+    """前回の分類以降に追加された異常時の行に原因カテゴリを付ける関数"""
+    cursor.execute('SELECT last_id FROM cause_state WHERE id = 1')
+    last_id = cursor.fetchone()[0]
+    cursor.execute('SELECT MAX(id) FROM train_data')
+    max_id = cursor.fetchone()[0]
+    if max_id is None or max_id <= last_id:
+        return
+
+    use_fts = has_fts(cursor)
+    for cause, keywords in CAUSE_KEYWORDS.items():
+        for keyword in keywords:
+            tables, condition, value = _keyword_query(keyword, use_fts)
+            cursor.execute(f'''
+            INSERT OR IGNORE INTO train_causes (cause, train_id)
+            SELECT ?, d.id
+            FROM {tables}
+            WHERE {condition}
+                AND d.id > ? AND d.id <= ?
+                AND d.status != ?
+            ''', (cause, value, last_id, max_id, NORMAL_STATUS))
+
+    cursor.execute('UPDATE cause_state SET last_id = ? WHERE id = 1', (max_id,))
+
+
+def reclassify_causes(cursor):
+    """原因カテゴリをすべて付け直す関数（キーワードを変更したとき用）"""
+    cursor.execute('DELETE FROM train_causes')
+    cursor.execute('UPDATE cause_state SET last_id = 0 WHERE id = 1')
+    classify_causes(cursor)
+
+
+def cause_counts(conn):
+    """原因カテゴリごとの件数と、異常全体に対する割合を返す関数"""
+    sql = '''
+    SELECT
+        cause,
+        COUNT(*) as count,
+        COUNT(*) * 100.0 / (SELECT SUM(count) FROM train_rollup WHERE status != ?) as percentage
+    FROM train_causes
+    GROUP BY cause
+    ORDER BY count DESC
+    '''
+    return pd.read_sql(sql, conn, params=(NORMAL_STATUS,))
+
+
+def cause_by_line(conn, cause=None):
+    """路線 × 原因カテゴリごとの件数を返す関数（causeで原因を絞り込める）"""
+    sql = '''
+    SELECT d.line, c.cause, COUNT(*) as count
+    FROM train_causes c
+    JOIN train_data d ON d.id = c.train_id
+    '''
+    params = ()
+    if cause is not None:
+        sql += 'WHERE c.cause = ?\n'
+        params = (cause,)
+    sql += 'GROUP BY d.line, c.cause ORDER BY count DESC'
+    return pd.read_sql(sql, conn, params=params)
+
+
+def search_detail(conn, keyword, line=None, limit=100):
+    """detailにキーワードを含む行を新しい順に返す関数"""
+    tables, condition, value = _keyword_query(keyword, has_fts(conn.cursor()))
+    params = [value]
+    sql = f'''
+    SELECT d.id, d.area, d.line, d.status, d.detail, d.date, d.time
+    FROM {tables}
+    WHERE {condition}
+    '''
+    if line is not None:
+        sql += 'AND d.line = ?\n'
+        params.append(line)
+    sql += 'ORDER BY d.date DESC, d.time DESC LIMIT ?'
+    params.append(limit)
+    return pd.read_sql(sql, conn, params=params)
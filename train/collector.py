@@ -0,0 +1,181 @@
+import requests
+from bs4 import BeautifulSoup
+import json
+import time
+import random
+from datetime import datetime
+import sqlite3
+import os
+
+from train import analytics, causes, dimensions, episodes
+
+# train_infoフォルダが存在しない場合は作成
+FOLDER_PATH = 'train_info'
+DB_PATH = 'train_info.db'
+
+TRAIN_DATA_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS train_data (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    area TEXT,
+    line TEXT,
+    status TEXT,
+    detail TEXT,
+    date DATE,
+    time TIME,
+    UNIQUE(line, date, time)
+)
+'''
+
+
+def random_sleep():
+    """ランダムな秒数（2-4秒）待機する関数"""
+    sleep_time = 2 + random.random() * 2
+    print(f"Waiting for {sleep_time:.2f} seconds...")
+    time.sleep(sleep_time)
+
+
+def create_tables(cursor):
+    """train_dataテーブルと集計・ディメンション・検索用のテーブルを作成する関数"""
+    cursor.execute(TRAIN_DATA_SCHEMA)
+    # 挿入のたびにトリガーで集計テーブルを更新する
+    analytics.init_rollups(cursor)
+    dimensions.init_dimensions(cursor)
+    episodes.init_episodes(cursor)
+    causes.init_causes(cursor)
+
+
+def store_to_db(train_info_list, current_time, db_path=DB_PATH):
+    """データベースにデータを格納する関数"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    create_tables(cursor)
+
+    current_date = current_time.strftime('%Y-%m-%d')
+    time_str = current_time.strftime('%H:%M:%S')
+
+    for info in train_info_list:
+        try:
+            cursor.execute('''
+            INSERT INTO train_data (area, line, status, detail, date, time)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                info['area'],
+                info['line'],
+                info['status'],
+                info['detail'],
+                current_date,
+                time_str
+            ))
+        except sqlite3.IntegrityError:
+            print(f"Duplicate entry skipped for {info['line']} at {time_str}")
+
+    # 新しいスナップショット分だけ運転障害エピソードと原因分類を更新
+    episodes.update_episodes(cursor)
+    causes.classify_causes(cursor)
+
+    # 現在のレコード数を取得して表示
+    cursor.execute('SELECT COUNT(*) FROM train_data')
+    total_records = cursor.fetchone()[0]
+    print(f"Total records in database: {total_records}")
+
+    conn.commit()
+    conn.close()
+
+
+def get_train_info(db_path=DB_PATH):
+    """運行情報を取得して保存し、取得ページ数・失敗数・件数を返す関数"""
+    base_url = "https://transit.yahoo.co.jp/diainfo"
+    train_info_dict = {}
+    stats = {'pages': 0, 'failures': 0, 'entries': 0}
+
+    if not os.path.exists(FOLDER_PATH):
+        os.makedirs(FOLDER_PATH)
+
+    # 現在時刻を取得
+    current_time = datetime.now()
+    print(f"Starting data collection at: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+
+    try:
+        # メインページへのリクエスト
+        response = requests.get(base_url, headers=headers)
+        stats['pages'] += 1
+        response.encoding = 'utf-8'
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        # メインページへのリクエスト後に遅延
+        random_sleep()
+
+        area_links = soup.find_all('a', href=lambda href: href and '/diainfo/area/' in href)
+        print(f"Found {len(area_links)} area links")
+
+        for area_link in area_links:
+            # エリアページへのリクエスト前に遅延
+            random_sleep()
+
+            area_url = 'https://transit.yahoo.co.jp' + area_link['href']
+            area_name = area_link.text.strip()
+            print(f"\nProcessing {area_name}")
+
+            try:
+                area_response = requests.get(area_url, headers=headers)
+                stats['pages'] += 1
+                area_response.encoding = 'utf-8'
+                area_soup = BeautifulSoup(area_response.text, 'html.parser')
+
+                train_divs = area_soup.find_all('div', class_='elmTblLstLine')
+
+                for div in train_divs:
+                    table = div.find('table')
+                    if table:
+                        rows = table.find_all('tr')[1:]
+                        for row in rows:
+                            try:
+                                cols = row.find_all('td')
+                                if len(cols) >= 3:
+                                    line_name = cols[0].text.strip()
+                                    train_info_dict[line_name] = {
+                                        'area': area_name,
+                                        'line': line_name,
+                                        'status': cols[1].text.strip(),
+                                        'detail': cols[2].text.strip()
+                                    }
+                                    print(f"Added/Updated: {line_name}")
+                            except Exception as e:
+                                print(f"Error processing row: {e}")
+                                continue
+
+            except Exception as e:
+                print(f"Error accessing {area_name}: {e}")
+                stats['failures'] += 1
+                continue
+
+        all_train_info = list(train_info_dict.values())
+
+        if all_train_info:
+            # JSONファイル名を YYYY-MM-DD-HH-MM 形式に変更し、フォルダパスを追加
+            json_filename = os.path.join(FOLDER_PATH, f'train_info_{current_time.strftime("%Y-%m-%d-%H-%M")}.json')
+
+            with open(json_filename, 'w', encoding='utf-8') as f:
+                json.dump(all_train_info, f, ensure_ascii=False, indent=2)
+
+            store_to_db(all_train_info, current_time, db_path)
+            stats['entries'] = len(all_train_info)
+
+            print(f"Successfully saved {len(all_train_info)} entries to database and {json_filename}")
+        else:
+            print("No data was collected")
+
+    except Exception as e:
+        print(f"Error in main process: {e}")
+        stats['failures'] += 1
+
+    return stats
+
+
+if __name__ == "__main__":
+    get_train_info()
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+# 時間帯カテゴリ（Categoricalのカテゴリ順）
+TIME_BANDS = ['通勤通学時間', '帰宅時間', 'その他時間', '観測外']
+
+# 時 → 時間帯カテゴリのコード（添字が時）
+HOUR_TO_BAND = np.full(24, TIME_BANDS.index('観測外'), dtype=np.int8)
+HOUR_TO_BAND[[7, 8]] = TIME_BANDS.index('通勤通学時間')
+HOUR_TO_BAND[[17, 18, 19]] = TIME_BANDS.index('帰宅時間')
+HOUR_TO_BAND[[12, 13]] = TIME_BANDS.index('その他時間')
+
+# エリアカテゴリ（Categoricalのカテゴリ順）
+AREA_CATEGORIES = ['都心', '郊外', 'その他']
+
+# 路線の分類定義（路線 → (エリアカテゴリ, 事業者)）
+LINE_DIMENSIONS = {
+    '山手線': ('都心', 'JR東日本'),
+    '中央線(快速)[東京～高尾]': ('都心', 'JR東日本'),
+    '京浜東北根岸線': ('都心', 'JR東日本'),
+    '東海道本線[東京～熱海]': ('都心', 'JR東日本'),
+    '湘南新宿ライン': ('都心', 'JR東日本'),
+    '横須賀線': ('都心', 'JR東日本'),
+    '常磐線(快速)[品川～取手]': ('都心', 'JR東日本'),
+    '総武線(快速)[東京～千葉]': ('都心', 'JR東日本'),
+    '中央総武線(各停)': ('都心', 'JR東日本'),
+    '北陸本線': ('郊外', 'JR西日本'),
+    '紀勢本線[和歌山～和歌山市]': ('郊外', 'JR西日本'),
+    '山陰本線[園部～鳥取]': ('郊外', 'JR西日本'),
+    '瀬戸大橋線[岡山～児島]': ('郊外', 'JR西日本'),
+    '木次線': ('郊外', 'JR西日本'),
+    '鳴門線': ('郊外', 'JR四国'),
+    '山陽本線[下関～門司]': ('郊外', 'JR九州'),
+    '花咲線': ('郊外', 'JR北海道'),
+}
+
+# 従来の辞書形式（エリアカテゴリ → 路線リスト）
+urban_rural_dict = {
+    area: [line for line, (category, _) in LINE_DIMENSIONS.items() if category == area]
+    for area in AREA_CATEGORIES[:2]
+}
+
+# 路線ディメンションと時間帯の参照テーブル
+DIMENSION_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS line_dim (
+    line TEXT PRIMARY KEY,
+    area TEXT,
+    category TEXT NOT NULL DEFAULT 'その他',
+    operator TEXT
+);
+CREATE TABLE IF NOT EXISTS time_band (
+    hour INTEGER PRIMARY KEY,
+    band TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS line_dim_insert AFTER INSERT ON train_data
+BEGIN
+    INSERT INTO line_dim (line, area) VALUES (NEW.line, NEW.area)
+    ON CONFLICT(line) DO UPDATE SET area = excluded.area WHERE area IS NULL;
+END;
+'''
+
+
+def init_dimensions(cursor):
+    """路線ディメンションと時間帯テーブルを作成・更新する関数"""
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE name = 'line_dim')")
+    exists = cursor.fetchone()[0]
+    cursor.executescript(DIMENSION_SCHEMA)
+    cursor.executemany(
+        'INSERT OR REPLACE INTO time_band (hour, band) VALUES (?, ?)',
+        [(hour, TIME_BANDS[code]) for hour, code in enumerate(HOUR_TO_BAND)]
+    )
+    if not exists:
+        # 既存データからの取り込みは作成時だけ（以降はトリガーで追加される）
+        cursor.execute('''
+        INSERT INTO line_dim (line, area) SELECT line, MAX(area) FROM train_data GROUP BY line
+        ON CONFLICT(line) DO UPDATE SET area = excluded.area WHERE area IS NULL
+        ''')
+    cursor.executemany('''
+    INSERT INTO line_dim (line, category, operator) VALUES (?, ?, ?)
+    ON CONFLICT(line) DO UPDATE SET category = excluded.category, operator = excluded.operator
+    ''', [(line, category, operator) for line, (category, operator) in LINE_DIMENSIONS.items()])
+
+
+def categorize_time(hour):
+    """時間を時間帯カテゴリに分類する関数（1件ずつ）"""
+    if hour in [7, 8]:
+        return '通勤通学時間'
+    elif hour in [17, 18, 19]:
+        return '帰宅時間'
+    elif hour in [12, 13]:
+        return 'その他時間'
+    else:
+        return '観測外'
+
+
+def categorize_area(line):
+    """路線をエリアカテゴリに分類する関数（1件ずつ）"""
+    for area, lines in urban_rural_dict.items():
+        if line in lines:
+            return area
+    return 'その他'
+
+
+def time_bands(hours):
+    """時の列をまとめて時間帯カテゴリ（Categorical）に変換する関数"""
+    codes = HOUR_TO_BAND[np.asarray(hours, dtype=np.intp)]
+    return pd.Categorical.from_codes(codes, categories=TIME_BANDS)
+
+
+def area_categories(lines):
+    """路線の列をまとめてエリアカテゴリ（Categorical）に変換する関数"""
+    # 路線名の種類ごとに1回だけ辞書を引き、コードをまとめて割り当てる
+    line_codes, uniques = pd.factorize(np.asarray(lines, dtype=object))
+    other = AREA_CATEGORIES.index('その他')
+    # 末尾に「その他」を置き、欠損（コード-1）もそこを指すようにする
+    unique_codes = np.array(
+        [AREA_CATEGORIES.index(LINE_DIMENSIONS[line][0]) if line in LINE_DIMENSIONS else other for line in uniques]
+        + [other],
+        dtype=np.int8
+    )
+    codes = unique_codes[line_codes]
+    return pd.Categorical.from_codes(codes, categories=AREA_CATEGORIES)
+
+
+def check_categorization(hours=range(24), lines=None):
+    """ベクトル化した分類結果が従来の関数と一致するか確認する関数"""
+    if lines is None:
+        lines = list(LINE_DIMENSIONS) + ['存在しない路線']
+    hours = list(hours)
+    expected_time = [categorize_time(hour) for hour in hours]
+    expected_area = [categorize_area(line) for line in lines]
+    assert list(time_bands(hours)) == expected_time
+    assert list(area_categories(lines)) == expected_area
+    print(f"OK: {len(hours)} hours, {len(lines)} lines")
+
+
+if __name__ == "__main__":
+    check_categorization()
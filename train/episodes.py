@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+from train.analytics import NORMAL_STATUS
+
+# 連続した異常スナップショットをまとめた「運転障害エピソード」
+# end_atは状況が変わったことを最初に観測した時刻（継続中はNULL）
+EPISODE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS disruption_episodes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    line TEXT,
+    status TEXT,
+    start_at TEXT,
+    end_at TEXT,
+    last_seen TEXT,
+    snapshots INTEGER,
+    duration_sec REAL
+);
+CREATE INDEX IF NOT EXISTS idx_disruption_episodes_line ON disruption_episodes(line, start_at);
+CREATE INDEX IF NOT EXISTS idx_disruption_episodes_open ON disruption_episodes(line) WHERE end_at IS NULL;
+CREATE TABLE IF NOT EXISTS episode_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_date DATE,
+    last_time TIME
+);
+INSERT OR IGNORE INTO episode_state (id, last_date, last_time) VALUES (1, '', '');
+CREATE INDEX IF NOT EXISTS idx_train_data_date_time ON train_data(date, time);
+'''
+
+# 路線ごとに観測時刻順に並べ、LAGで状況の切り替わりを検出して連番（run_id）を振る
+# 平常運転以外のrunを1エピソードとして集約する
+EPISODE_SQL = '''
+WITH obs AS (
+    SELECT line, status, date || ' ' || time AS observed_at
+    FROM train_data
+    WHERE (date, time) > (?, ?)
+    UNION
+    SELECT d.line, d.status, d.date || ' ' || d.time
+    FROM open_episodes o
+    JOIN train_data d
+        ON d.line = o.line
+        AND (d.date, d.time) >= (substr(o.start_at, 1, 10), substr(o.start_at, 12))
+),
+flagged AS (
+    SELECT
+        line, status, observed_at,
+        CASE WHEN status = LAG(status) OVER w THEN 0 ELSE 1 END AS is_start,
+        LEAD(observed_at) OVER w AS next_at
+    FROM obs
+    WINDOW w AS (PARTITION BY line ORDER BY observed_at)
+),
+runs AS (
+    SELECT *, SUM(is_start) OVER (PARTITION BY line ORDER BY observed_at ROWS UNBOUNDED PRECEDING) AS run_id
+    FROM flagged
+)
+INSERT INTO disruption_episodes (line, status, start_at, end_at, last_seen, snapshots, duration_sec)
+SELECT
+    line,
+    status,
+    start_at,
+    end_at,
+    last_seen,
+    snapshots,
+    ROUND((julianday(COALESCE(end_at, last_seen)) - julianday(start_at)) * 86400)
+FROM (
+    SELECT
+        line,
+        status,
+        MIN(observed_at) AS start_at,
+        CASE WHEN COUNT(next_at) = COUNT(*) THEN MAX(next_at) END AS end_at,
+        MAX(observed_at) AS last_seen,
+        COUNT(*) AS snapshots
+    FROM runs
+    WHERE status != ?
+    GROUP BY line, run_id
+)
+'''
+
+
+def init_episodes(cursor):
+    """エピソードテーブルを作成する関数"""
+    cursor.executescript(EPISODE_SCHEMA)
+
+
+def update_episodes(cursor):
+    """前回の処理以降に追加されたスナップショットからエピソードを更新する関数"""
+    cursor.execute('SELECT last_date, last_time FROM episode_state WHERE id = 1')
+    last_date, last_time = cursor.fetchone()
+
+    # 継続中のエピソードは開始時刻から計算し直すため、いったん取り除く
+    cursor.execute('DROP TABLE IF EXISTS temp.open_episodes')
+    cursor.execute('''
+    CREATE TEMP TABLE open_episodes AS
+    SELECT line, MIN(start_at) AS start_at FROM disruption_episodes WHERE end_at IS NULL GROUP BY line
+    ''')
+    cursor.execute('DELETE FROM disruption_episodes WHERE end_at IS NULL')
+
+    cursor.execute(EPISODE_SQL, (last_date, last_time, NORMAL_STATUS))
+    cursor.execute('DROP TABLE temp.open_episodes')
+
+    cursor.execute('''
+    UPDATE episode_state SET (last_date, last_time) = (
+        SELECT date, time FROM train_data ORDER BY date DESC, time DESC LIMIT 1
+    )
+    WHERE id = 1 AND EXISTS(SELECT 1 FROM train_data)
+    ''')
+
+
+def rebuild_episodes(cursor):
+    """train_data全体からエピソードを作り直す関数
+
+    全件の再計算はウィンドウ関数より速いNumPyのランレングス処理で行う
+    （路線・状況・観測時刻を整数に変換し、路線か状況が切り替わる位置でrunを区切る）。
+    """
+    cursor.execute('DELETE FROM disruption_episodes')
+    cursor.execute("UPDATE episode_state SET last_date = '', last_time = '' WHERE id = 1")
+    cursor.execute('SELECT line, status, date, time FROM train_data')
+    data = pd.DataFrame(cursor.fetchall(), columns=['line', 'status', 'date', 'time'])
+    if not len(data):
+        return
+
+    line_codes, lines = pd.factorize(data['line'])
+    status_codes, statuses = pd.factorize(data['status'])
+    # 観測時刻は種類が少ないので、時刻順の整数コードに変換してから並べ替える
+    observed_codes, observed = pd.factorize(data['date'] + ' ' + data['time'], sort=True)
+    del data
+    order = np.lexsort((observed_codes, line_codes))
+    line_codes = line_codes[order]
+    status_codes = status_codes[order]
+    observed_codes = observed_codes[order]
+    count = len(order)
+
+    # 路線か状況が前の行と変わった位置がrunの開始
+    is_start = np.ones(count, dtype=bool)
+    is_start[1:] = (line_codes[1:] != line_codes[:-1]) | (status_codes[1:] != status_codes[:-1])
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], count) - 1
+
+    # 平常運転以外のrunがエピソード
+    normal_code = statuses.get_loc(NORMAL_STATUS) if NORMAL_STATUS in statuses else -1
+    abnormal = status_codes[starts] != normal_code
+    starts, ends = starts[abnormal], ends[abnormal]
+
+    # 終了時刻は同じ路線の次の観測時刻（その路線の最後のrunなら継続中でNULL）
+    after = np.minimum(ends + 1, count - 1)
+    has_next = (ends + 1 < count) & (line_codes[after] == line_codes[ends])
+    start_codes = observed_codes[starts]
+    last_codes = observed_codes[ends]
+    end_codes = np.where(has_next, observed_codes[after], -1)
+
+    seconds = pd.to_datetime(observed, format='%Y-%m-%d %H:%M:%S').values.astype('datetime64[s]').astype(np.int64)
+    durations = seconds[np.where(has_next, end_codes, last_codes)] - seconds[start_codes]
+
+    observed = np.asarray(observed, dtype=object)
+    end_at = np.where(has_next, observed[np.maximum(end_codes, 0)], None)
+    cursor.executemany('''
+    INSERT INTO disruption_episodes (line, status, start_at, end_at, last_seen, snapshots, duration_sec)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', zip(
+        np.asarray(lines, dtype=object)[line_codes[starts]],
+        np.asarray(statuses, dtype=object)[status_codes[starts]],
+        observed[start_codes],
+        end_at,
+        observed[last_codes],
+        (ends - starts + 1).tolist(),
+        durations.astype(float).tolist(),
+    ))
+
+    cursor.execute('''
+    UPDATE episode_state SET (last_date, last_time) = (
+        SELECT date, time FROM train_data ORDER BY date DESC, time DESC LIMIT 1
+    )
+    WHERE id = 1
+    ''')
+
+
+def disruption_episodes(conn, line=None):
+    """エピソード一覧をDataFrameで返す関数（lineで路線を絞り込める）"""
+    sql = '''
+    SELECT line, status, start_at, end_at, last_seen, snapshots, duration_sec
+    FROM disruption_episodes
+    '''
+    params = ()
+    if line is not None:
+        sql += 'WHERE line = ?\n'
+        params = (line,)
+    sql += 'ORDER BY line, start_at'
+    episodes = pd.read_sql(sql, conn, params=params, parse_dates=['start_at', 'end_at', 'last_seen'])
+    episodes['duration'] = pd.to_timedelta(episodes['duration_sec'], unit='s')
+    return episodes
+
+
+def disruption_summary(conn):
+    """路線 × 異常種類ごとのエピソード数と合計・最長の継続時間（秒）を返す関数"""
+    sql = '''
+    SELECT
+        line,
+        status,
+        COUNT(*) as episodes,
+        SUM(duration_sec) as total_sec,
+        MAX(duration_sec) as longest_sec
+    FROM disruption_episodes
+    GROUP BY line, status
+    ORDER BY total_sec DESC
+    '''
+    return pd.read_sql(sql, conn)
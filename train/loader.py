@@ -0,0 +1,93 @@
+import pandas as pd
+
+# カテゴリ型に変換する列
+CATEGORY_COLUMNS = ('area', 'line', 'status')
+
+# 既定で読み込む列（detailは長い文字列なので明示したときだけ読む）
+DEFAULT_COLUMNS = ('area', 'line', 'status', 'date', 'time')
+
+# 1回に読み込む行数
+CHUNKSIZE = 50_000
+
+
+def _categories(conn, column):
+    """列の値の一覧を取得する関数（全チャンクで同じカテゴリを使うため）"""
+    cursor = conn.execute(f'SELECT DISTINCT {column} FROM train_data WHERE {column} IS NOT NULL ORDER BY {column}')
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _build_query(columns, where):
+    """読み込み用のSQLを組み立てる関数"""
+    sql = f"SELECT {', '.join(columns)} FROM train_data"
+    if where:
+        sql += f" WHERE {where}"
+    return sql + " ORDER BY id"
+
+
+def _convert(chunk, dtypes, has_timestamp):
+    """1チャンク分の型変換を行う関数"""
+    for column, dtype in dtypes.items():
+        chunk[column] = chunk[column].astype(dtype)
+    if has_timestamp:
+        chunk['observed_at'] = pd.to_datetime(
+            chunk['date'] + ' ' + chunk['time'], format='%Y-%m-%d %H:%M:%S', errors='coerce'
+        ).astype('datetime64[ns]')
+        chunk = chunk.drop(columns=['date', 'time'])
+    return chunk
+
+
+def _dtypes(conn, columns):
+    return {
+        column: pd.CategoricalDtype(_categories(conn, column))
+        for column in CATEGORY_COLUMNS if column in columns
+    }
+
+
+def iter_train_data(conn, columns=DEFAULT_COLUMNS, where=None, params=(), chunksize=CHUNKSIZE):
+    """train_dataをチャンクごとに読み込み、型変換したDataFrameを順に返すジェネレーター
+
+    area/line/status は全チャンク共通のカテゴリを持つCategoricalに、
+    date/time は observed_at（datetime64）1列にまとめて変換する。
+    """
+    columns = list(columns)
+    dtypes = _dtypes(conn, columns)
+    has_timestamp = 'date' in columns and 'time' in columns
+
+    for chunk in pd.read_sql(_build_query(columns, where), conn, params=params, chunksize=chunksize):
+        yield _convert(chunk, dtypes, has_timestamp)
+
+
+def load_train_data(conn, columns=DEFAULT_COLUMNS, where=None, params=(), chunksize=CHUNKSIZE):
+    """train_dataをチャンク単位で変換しながら1つのDataFrameにまとめる関数"""
+    chunks = list(iter_train_data(conn, columns, where, params, chunksize))
+    if not chunks:
+        # 行がなくても、行があるときと同じ列・型で返す
+        columns = list(columns)
+        empty = pd.DataFrame({column: pd.Series(dtype=object) for column in columns})
+        return _convert(empty, _dtypes(conn, columns), 'date' in columns and 'time' in columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def aggregate_train_data(conn, by, where=None, params=(), chunksize=CHUNKSIZE, transform=None):
+    """チャンクごとに件数を集計して足し合わせる関数
+
+    メモリに載るのは1チャンクと集計結果だけなので、テーブルの大きさに関係なく
+    使用メモリは chunksize とグループ数で決まる。
+    transform にはチャンクを受け取り、集計用の列を追加したDataFrameを返す関数を渡せる。
+    """
+    by = list(by)
+    # date/time の読み込みと変換は、observed_at を使うときだけ行う
+    needs_timestamp = 'observed_at' in by or transform is not None
+    columns = [
+        column for column in DEFAULT_COLUMNS
+        if column in by or (needs_timestamp and column in ('date', 'time'))
+    ]
+    total = None
+    for chunk in iter_train_data(conn, columns, where, params, chunksize):
+        if transform is not None:
+            chunk = transform(chunk)
+        counts = chunk.groupby(by, observed=True).size()
+        total = counts if total is None else total.add(counts, fill_value=0)
+    if total is None:
+        return pd.DataFrame(columns=by + ['count'])
+    return total.astype('int64').rename('count').reset_index()
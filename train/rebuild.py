@@ -0,0 +1,145 @@
+"""train_info/ に保存されたJSONから train_info.db を作り直すコマンド
+
+使い方:
+    python -m train.rebuild --archive train_info --db train_info.db
+
+途中で止まっても、同じコマンドをもう一度実行すれば読み込み済みのファイルを飛ばして再開する。
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from train import causes, episodes
+from train.collector import DB_PATH, FOLDER_PATH, TRAIN_DATA_SCHEMA, create_tables
+
+# train_info_YYYY-MM-DD-HH-MM.json から日付と時刻を取り出す
+FILENAME_PATTERN = re.compile(r'train_info_(\d{4}-\d{2}-\d{2})-(\d{2})-(\d{2})\.json$')
+
+# 読み込み済みファイルの記録（再開用）
+REBUILD_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rebuild_files (
+    filename TEXT PRIMARY KEY,
+    rows INTEGER,
+    loaded_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+'''
+
+
+def parse_file(path):
+    """JSONファイルを読み込み、train_dataの行のリストを返す関数（ワーカープロセスで実行）"""
+    filename = os.path.basename(path)
+    match = FILENAME_PATTERN.search(filename)
+    if not match:
+        return filename, None, 'unexpected filename'
+    date, hour, minute = match.groups()
+    time_str = f'{hour}:{minute}:00'
+    try:
+        with open(path, encoding='utf-8') as f:
+            train_info_list = json.load(f)
+        rows = [
+            (info['area'], info['line'], info['status'], info['detail'], date, time_str)
+            for info in train_info_list
+        ]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return filename, None, str(e)
+    return filename, rows, None
+
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def rebuild(archive=FOLDER_PATH, db_path=DB_PATH, workers=None, batch_size=500, overwrite=False):
+    """アーカイブを並列に読み込み、まとまった単位でデータベースに書き込む関数"""
+    if overwrite and os.path.exists(db_path):
+        os.remove(db_path)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA journal_mode = WAL')
+    cursor.execute('PRAGMA synchronous = NORMAL')
+
+    # 既存のデータベースは、前回の再構築の続きである場合だけ書き込みを許可する
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('train_data', 'rebuild_files')")
+    tables = {row[0] for row in cursor.fetchall()}
+    if 'train_data' in tables and 'rebuild_files' not in tables:
+        conn.close()
+        raise SystemExit(f"{db_path} は再構築で作られたデータベースではありません（--overwrite で作り直せます）")
+    cursor.execute(TRAIN_DATA_SCHEMA)
+    cursor.executescript(REBUILD_SCHEMA)
+
+    cursor.execute('SELECT filename FROM rebuild_files')
+    loaded = {row[0] for row in cursor.fetchall()}
+    paths = sorted(
+        path for path in glob.glob(os.path.join(archive, 'train_info_*.json'))
+        if os.path.basename(path) not in loaded
+    )
+    print(f"{len(loaded)} files already loaded, {len(paths)} files to load")
+
+    started = time.perf_counter()
+    done = failed = inserted = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in _batches(paths, batch_size):
+            results = list(executor.map(parse_file, batch, chunksize=max(1, batch_size // 32)))
+            rows = []
+            files = []
+            for filename, file_rows, error in results:
+                if error is not None:
+                    print(f"Skipped {filename}: {error}")
+                    failed += 1
+                    continue
+                rows.extend(file_rows)
+                files.append((filename, len(file_rows)))
+
+            # 1バッチ分のファイルを1トランザクションで書き込む（(line, date, time)の重複は無視）
+            before = conn.total_changes
+            cursor.executemany('''
+            INSERT OR IGNORE INTO train_data (area, line, status, detail, date, time)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            inserted += conn.total_changes - before
+            cursor.executemany('INSERT OR REPLACE INTO rebuild_files (filename, rows) VALUES (?, ?)', files)
+            conn.commit()
+
+            done += len(files)
+            elapsed = time.perf_counter() - started
+            print(f"{done}/{len(paths)} files, {inserted} rows inserted, {done / elapsed:.1f} files/sec")
+
+    # 集計テーブル・ディメンション・エピソード・原因分類を作り直す
+    # （集計テーブルは空の状態で作成すると、train_dataからまとめて集計される）
+    cursor.execute('DROP TABLE IF EXISTS train_rollup')
+    create_tables(cursor)
+    episodes.rebuild_episodes(cursor)
+    causes.classify_causes(cursor)
+    conn.commit()
+
+    cursor.execute('SELECT COUNT(*) FROM train_data')
+    total_records = cursor.fetchone()[0]
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"Loaded {done} files ({failed} failed) in {elapsed:.1f}s, {rate:.1f} files/sec")
+    print(f"Total records in database: {total_records}")
+    return done, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='train_info/ のJSONから train_info.db を再構築する')
+    parser.add_argument('--archive', default=FOLDER_PATH, help='JSONファイルのフォルダ')
+    parser.add_argument('--db', default=DB_PATH, help='書き込み先のデータベース')
+    parser.add_argument('--workers', type=int, default=None, help='JSONを読み込むプロセス数')
+    parser.add_argument('--batch-size', type=int, default=500, help='1トランザクションで書き込むファイル数')
+    parser.add_argument('--overwrite', action='store_true', help='既存のデータベースを削除して作り直す')
+    args = parser.parse_args()
+    rebuild(args.archive, args.db, args.workers, args.batch_size, args.overwrite)
+
+
+if __name__ == "__main__":
+    main()
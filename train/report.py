@@ -0,0 +1,266 @@
+"""分析グラフをまとめた静的HTMLレポートを作るコマンド
+
+使い方:
+    python -m train.report --db train_info.db --out report
+
+グラフの元になる集計結果のハッシュをファイル名に含めて保存し、
+集計結果が変わっていないグラフは描画し直さない。
+"""
+import argparse
+import hashlib
+import html
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import japanize_matplotlib  # noqa: F401
+import pandas as pd
+
+from train import analytics, causes, dimensions
+from train.collector import DB_PATH, create_tables
+
+# 描画処理を変更したら上げる（古いキャッシュを使わないようにする）
+RENDER_VERSION = 1
+REPORT_DIR = 'report'
+
+
+def plot_abnormal_by_line(data, path):
+    """路線別の異常発生回数"""
+    plt.figure(figsize=(15, 6))
+    plt.bar(data['line'], data['count'], color='steelblue')
+    plt.title('路線別の運転状況異常発生回数', fontsize=14)
+    plt.xlabel('路線名', fontsize=10)
+    plt.ylabel('異常発生回数', fontsize=10)
+    plt.xticks(rotation=90, ha='right', fontsize=9)
+    ymax = data['count'].max() if len(data) else 0
+    plt.yticks(range(0, int(ymax) + 3, 3))
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_abnormal_by_hour(data, path):
+    """時間別・時間帯カテゴリ別の異常発生頻度"""
+    category_analysis = data.groupby('time_category', observed=True)['count'].sum().reset_index()
+    plt.figure(figsize=(15, 6))
+    plt.subplot(1, 2, 1)
+    plt.bar(data['hour'], data['count'])
+    plt.title('時間別の異常発生頻度', fontsize=14)
+    plt.xlabel('時間', fontsize=9)
+    plt.ylabel('異常発生回数', fontsize=12)
+    plt.xticks(list(analytics.OBSERVED_HOURS))
+    plt.grid(True, alpha=0.3)
+    plt.subplot(1, 2, 2)
+    plt.bar(category_analysis['time_category'].astype(str), category_analysis['count'])
+    plt.title('時間帯カテゴリ別の異常発生頻度', fontsize=14)
+    plt.xlabel('時間帯カテゴリ', fontsize=9)
+    plt.ylabel('異常発生回数', fontsize=12)
+    plt.xticks(rotation=45)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_area_status(data, path):
+    """都心・郊外の異常発生パターン"""
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+    if len(data):
+        data.plot(kind='bar', stacked=True, ax=ax1)
+        ax1.legend(title='異常種類', bbox_to_anchor=(1.05, 1))
+        area_total = data.sum(axis=1)
+        ax2.pie(area_total, labels=area_total.index, autopct='%1.1f%%', startangle=90)
+    ax1.set_title('エリア別の異常発生パターン', fontsize=14)
+    ax1.set_xlabel('エリア', fontsize=9)
+    ax1.set_ylabel('異常発生回数', fontsize=12)
+    ax2.set_title('都心・郊外の異常発生比率', fontsize=14)
+    plt.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_cause_breakdown(data, path):
+    """異常原因の内訳"""
+    fig, ax = plt.subplots(figsize=(10, 8))
+    if len(data):
+        wedges, texts, autotexts = ax.pie(
+            data['percentage'],
+            autopct='%1.1f%%',
+            startangle=90,
+            pctdistance=0.85,
+            counterclock=False,
+            textprops={'fontsize': 10}
+        )
+        ax.legend(wedges, data['status'], title='Status', loc="center left", bbox_to_anchor=(1, 0.5), fontsize=10)
+        fig.gca().add_artist(plt.Circle((0, 0), 0.70, fc='white'))
+    ax.set_title('異常原因の内訳', fontsize=14)
+    plt.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_line_importance(data, path):
+    """路線重要度ランキング"""
+    fig, ax = plt.subplots(figsize=(16, 8))
+    top = data.nlargest(30, 'score')
+    ax.bar(top['line'], top['score'])
+    ax.set_title('路線重要度ランキング')
+    ax.set_xlabel('路線名')
+    ax.set_ylabel('重要度スコア')
+    ax.tick_params(axis='x', rotation=90)
+    plt.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_urban_lines(data, path):
+    """都心部の路線別異常発生パターン"""
+    fig, ax = plt.subplots(figsize=(15, 6))
+    if len(data):
+        data.plot(kind='bar', stacked=True, ax=ax)
+        ax.legend(title='異常種類', bbox_to_anchor=(1.05, 1))
+    ax.set_title('都心部の路線別異常発生パターン', fontsize=14)
+    ax.set_xlabel('路線名', fontsize=9)
+    ax.set_ylabel('異常発生回数', fontsize=12)
+    ax.tick_params(axis='x', rotation=45)
+    plt.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_detail_causes(data, path):
+    """詳細文から分類した原因カテゴリ別の件数"""
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bar(data['cause'], data['count'], color='indianred')
+    ax.set_title('詳細文から分類した原因別の件数', fontsize=14)
+    ax.set_xlabel('原因', fontsize=9)
+    ax.set_ylabel('件数', fontsize=12)
+    ax.tick_params(axis='x', rotation=45)
+    plt.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def _hourly(conn):
+    data = analytics.abnormal_by_hour(conn)
+    data['time_category'] = dimensions.time_bands(data['hour'])
+    return data
+
+
+def _urban_lines(conn):
+    urban = [line for line, (category, _) in dimensions.LINE_DIMENSIONS.items() if category == '都心']
+    return analytics.line_status_pivot(conn, urban)
+
+
+# (グラフ名, 見出し, 集計関数, 描画関数)
+CHARTS = [
+    ('abnormal_by_line', '路線別の異常発生回数', analytics.abnormal_by_line, plot_abnormal_by_line),
+    ('abnormal_by_hour', '時間帯別の異常発生回数', _hourly, plot_abnormal_by_hour),
+    ('area_status', '都心と郊外の異常発生パターン', analytics.area_status_pivot, plot_area_status),
+    ('cause_breakdown', '異常発生パターン', analytics.cause_breakdown, plot_cause_breakdown),
+    ('detail_causes', '詳細文から分類した原因', causes.cause_counts, plot_detail_causes),
+    ('line_importance', '路線の重要度', analytics.line_importance, plot_line_importance),
+    ('urban_lines', '都心部の路線別異常発生パターン', _urban_lines, plot_urban_lines),
+]
+
+
+def data_hash(name, data):
+    """集計結果のハッシュ（グラフのキャッシュキー）を計算する関数"""
+    digest = hashlib.sha256(f'{name}:{RENDER_VERSION}:'.encode())
+    digest.update(data.to_csv().encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def render_chart(plot, data, path):
+    """ワーカープロセスでグラフを描画してPNGに保存する関数"""
+    tmp_path = path + '.tmp.png'
+    plot(data, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_html(out_dir, sections, generated_at):
+    """グラフと集計表を並べたHTMLを書き出す関数"""
+    parts = [
+        '<!DOCTYPE html>',
+        '<html lang="ja"><head><meta charset="utf-8"><title>運行情報レポート</title>',
+        '<style>body{font-family:sans-serif;margin:2em}img{max-width:100%}'
+        'table{border-collapse:collapse;font-size:small}td,th{border:1px solid #ccc;padding:2px 6px}</style>',
+        '</head><body>',
+        '<h1>運行情報レポート</h1>',
+        f'<p>作成日時: {generated_at:%Y-%m-%d %H:%M:%S}</p>',
+    ]
+    for title, image, data in sections:
+        parts.append(f'<h2>{html.escape(title)}</h2>')
+        parts.append(f'<img src="{html.escape(os.path.relpath(image, out_dir))}" alt="{html.escape(title)}">')
+        parts.append('<details><summary>集計表</summary>')
+        parts.append(data.to_html(index=not isinstance(data.index, pd.RangeIndex)))
+        parts.append('</details>')
+    parts.append('</body></html>')
+    path = os.path.join(out_dir, 'index.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+    return path
+
+
+def build_report(db_path=DB_PATH, out_dir=REPORT_DIR, workers=None):
+    """集計 → 変更のあったグラフだけ並列に描画 → HTML出力 を行う関数"""
+    started = time.perf_counter()
+    # sqlite3.connect は存在しないパスでも空のデータベースを作ってしまうので先に確認する
+    if not os.path.exists(db_path):
+        raise SystemExit(f"{db_path} が見つかりません")
+    chart_dir = os.path.join(out_dir, 'charts')
+    os.makedirs(chart_dir, exist_ok=True)
+
+    # 集計は集計テーブルから読むだけなので、メインプロセスでまとめて行う
+    conn = sqlite3.connect(db_path)
+    try:
+        # 古いデータベースでも集計・ディメンション・検索用のテーブルを作成（既存データから取り込む）
+        create_tables(conn.cursor())
+        conn.commit()
+        aggregates = [(name, title, aggregate(conn), plot) for name, title, aggregate, plot in CHARTS]
+    finally:
+        conn.close()
+
+    sections = []
+    jobs = []
+    for name, title, data, plot in aggregates:
+        path = os.path.join(chart_dir, f'{name}-{data_hash(name, data)}.png')
+        sections.append((title, path, data))
+        if not os.path.exists(path):
+            jobs.append((plot, data, path))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_chart, plot, data, path) for plot, data, path in jobs]
+            for future in futures:
+                print(f"Rendered {future.result()}")
+
+    # 使われなくなった古いグラフを削除
+    current = {os.path.basename(path) for _, path, _ in sections}
+    for filename in os.listdir(chart_dir):
+        if filename.endswith('.png') and filename not in current:
+            os.remove(os.path.join(chart_dir, filename))
+
+    report_path = write_html(out_dir, sections, datetime.now())
+    elapsed = time.perf_counter() - started
+    print(f"{len(jobs)} rendered, {len(sections) - len(jobs)} cached, wrote {report_path} in {elapsed:.1f}s")
+    return report_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='運行情報の分析レポートをHTMLで出力する')
+    parser.add_argument('--db', default=DB_PATH, help='読み込むデータベース')
+    parser.add_argument('--out', default=REPORT_DIR, help='出力先フォルダ')
+    parser.add_argument('--workers', type=int, default=None, help='グラフを描画するプロセス数')
+    args = parser.parse_args()
+    build_report(args.db, args.out, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""運行情報のスナップショットを定時に取得し続けるコマンド
+
+使い方:
+    python -m train.scheduler --schedule "0 7,8,12,13,17,18,19 * * *" --jitter 120
+
+スケジュールはcron形式（分 時 日 月 曜日）で指定する。
+停止中に取り逃した時刻は、遅れが --max-lateness 秒以内なら起動直後に1回だけ取得し、
+それより古いものは runs テーブルに missed として記録する。
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+from train.collector import DB_PATH, get_train_info
+
+# 分析で前提としている観測時刻（7, 8, 12, 13, 17, 18, 19時）
+DEFAULT_SCHEDULE = '0 7,8,12,13,17,18,19 * * *'
+
+RUNS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    slot DATETIME,
+    started_at DATETIME,
+    finished_at DATETIME,
+    duration_sec REAL,
+    pages INTEGER,
+    failures INTEGER,
+    entries INTEGER,
+    status TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_slot ON runs(slot);
+'''
+
+# cronの各フィールドの取りうる範囲
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+
+def parse_field(field, low, high):
+    """cronの1フィールド（*, 1,2, 1-5, */15 など）を値の集合に変換する関数"""
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/')
+            step = int(step_str)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = map(int, part.split('-'))
+        else:
+            start = end = int(part)
+            if step != 1:
+                end = high
+        if not (low <= start <= end <= high) or step < 1:
+            raise ValueError(f"invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_schedule(schedule):
+    """cron形式の文字列を (分, 時, 日, 月, 曜日) の集合のタプルに変換する関数"""
+    fields = schedule.split()
+    if len(fields) != 5:
+        raise ValueError(f"schedule must have 5 fields: {schedule}")
+    parsed = [parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)]
+    # cronと同じく、日と曜日が両方指定されているときはどちらかに一致すればよい
+    parsed.append(fields[2] != '*' and fields[4] != '*')
+    return tuple(parsed)
+
+
+def _day_matches(day, schedule):
+    _, _, days, months, weekdays, either = schedule
+    if day.month not in months:
+        return False
+    # cronの曜日は日曜が0
+    day_ok = day.day in days
+    weekday_ok = (day.weekday() + 1) % 7 in weekdays
+    return (day_ok or weekday_ok) if either else (day_ok and weekday_ok)
+
+
+def next_slot(schedule, after):
+    """after より後で最初に来る予定時刻を返す関数"""
+    minutes, hours = sorted(schedule[0]), sorted(schedule[1])
+    day = after.replace(hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(366 * 4):
+        if _day_matches(day, schedule):
+            for hour in hours:
+                for minute in minutes:
+                    slot = day.replace(hour=hour, minute=minute)
+                    if slot > after:
+                        return slot
+        day += timedelta(days=1)
+    raise ValueError("schedule never fires")
+
+
+def due_slots(schedule, since, now):
+    """since より後、now 以前の予定時刻を古い順に返す関数"""
+    slots = []
+    slot = next_slot(schedule, since)
+    while slot <= now:
+        slots.append(slot)
+        slot = next_slot(schedule, slot)
+    return slots
+
+
+def lock_path_for(db_path):
+    """データベースごとのロックファイルのパス（起動したフォルダによらず同じになる）"""
+    return os.path.abspath(db_path) + '.lock'
+
+
+def acquire_lock(lock_path):
+    """同じデータベースに対してスケジューラーが二重に起動しないようにロックを取る関数
+
+    OSのファイルロックを使うので、プロセスが異常終了・強制終了してもロックはOSが解放する。
+    返したファイルはプロセスが動いている間開いたままにしておく。
+    """
+    lock_file = open(lock_path, 'a+')
+    try:
+        if os.name == 'nt':
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        try:
+            lock_file.seek(0)
+            pid = lock_file.read().strip() or '?'
+        except OSError:
+            # Windowsではロック中の範囲は読めない
+            pid = '?'
+        lock_file.close()
+        raise SystemExit(f"scheduler is already running (pid {pid})")
+    # pidは確認用に書いておくだけ（ロックの判定には使わない）
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+
+def release_lock(lock_file):
+    """ロックを解放する関数（ファイルは他のプロセスが開いている可能性があるので消さない）"""
+    if os.name == 'nt':
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    lock_file.close()
+
+
+def record_run(conn, slot, started_at=None, finished_at=None, stats=None, status='ok', error=None):
+    """1回分の実行結果を runs テーブルに記録する関数"""
+    stats = stats or {}
+    duration = (finished_at - started_at).total_seconds() if started_at and finished_at else None
+    conn.execute('''
+    INSERT INTO runs (slot, started_at, finished_at, duration_sec, pages, failures, entries, status, error)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        slot.strftime('%Y-%m-%d %H:%M:%S'),
+        started_at.strftime('%Y-%m-%d %H:%M:%S') if started_at else None,
+        finished_at.strftime('%Y-%m-%d %H:%M:%S') if finished_at else None,
+        duration,
+        stats.get('pages'),
+        stats.get('failures'),
+        stats.get('entries'),
+        status,
+        error
+    ))
+    conn.commit()
+
+
+def run_slot(conn, slot, db_path=DB_PATH):
+    """予定時刻 slot のスナップショットを取得して記録する関数"""
+    started_at = datetime.now()
+    print(f"Run for slot {slot:%Y-%m-%d %H:%M} started at {started_at:%H:%M:%S}")
+    stats, status, error = None, 'ok', None
+    try:
+        stats = get_train_info(db_path)
+        if not stats['entries']:
+            status = 'error'
+    except Exception as e:
+        status, error = 'error', str(e)
+        print(f"Error in scheduled run: {e}")
+    finished_at = datetime.now()
+    record_run(conn, slot, started_at, finished_at, stats, status, error)
+    print(f"Run for slot {slot:%Y-%m-%d %H:%M} finished in {(finished_at - started_at).total_seconds():.1f}s ({status})")
+
+
+def last_recorded_slot(conn):
+    cursor = conn.execute('SELECT MAX(slot) FROM runs')
+    last = cursor.fetchone()[0]
+    return datetime.strptime(last, '%Y-%m-%d %H:%M:%S') if last else None
+
+
+def catch_up(conn, schedule, max_lateness, db_path=DB_PATH):
+    """取り逃した予定時刻を処理する関数（直近の1回だけ取得し、残りは missed として記録）"""
+    now = datetime.now()
+    last = last_recorded_slot(conn)
+    if last is None:
+        return
+    missed = due_slots(schedule, last, now)
+    if not missed:
+        return
+    for slot in missed[:-1]:
+        record_run(conn, slot, status='missed')
+    latest = missed[-1]
+    if (now - latest).total_seconds() <= max_lateness:
+        run_slot(conn, latest, db_path)
+    else:
+        record_run(conn, latest, status='missed')
+    print(f"Caught up on {len(missed)} missed slot(s)")
+
+
+def sleep_until(target):
+    """target まで待機する関数（時計のずれに備えて細かく区切って待つ）"""
+    while True:
+        remaining = (target - datetime.now()).total_seconds()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, 60))
+
+
+def run_forever(schedule=DEFAULT_SCHEDULE, db_path=DB_PATH, jitter=120, max_lateness=1800):
+    """予定時刻ごとにスナップショットを取得し続ける関数（実行は常に1つずつ）"""
+    parsed = parse_schedule(schedule)
+    lock_file = acquire_lock(lock_path_for(db_path))
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(RUNS_SCHEMA)
+        while True:
+            # 実行が長引いて次の予定を過ぎた場合も、catch_upで1回にまとめる
+            catch_up(conn, parsed, max_lateness, db_path)
+            slot = next_slot(parsed, last_recorded_slot(conn) or datetime.now())
+            if slot <= datetime.now():
+                continue
+            start = slot + timedelta(seconds=random.uniform(0, jitter))
+            print(f"Next slot {slot:%Y-%m-%d %H:%M}, starting at {start:%H:%M:%S}")
+            sleep_until(start)
+            run_slot(conn, slot, db_path)
+    finally:
+        conn.close()
+        release_lock(lock_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='運行情報のスナップショットを定時に取得する')
+    parser.add_argument('--schedule', default=DEFAULT_SCHEDULE, help='cron形式のスケジュール（分 時 日 月 曜日）')
+    parser.add_argument('--db', default=DB_PATH, help='runs テーブルを記録するデータベース')
+    parser.add_argument('--jitter', type=float, default=120, help='予定時刻から遅らせる最大秒数')
+    parser.add_argument('--max-lateness', type=float, default=1800, help='取り逃した時刻を取得し直す最大の遅れ（秒）')
+    args = parser.parse_args()
+    try:
+        run_forever(args.schedule, args.db, args.jitter, args.max_lateness)
+    except KeyboardInterrupt:
+        print("Scheduler stopped")
+
+
+if __name__ == "__main__":
+    main()